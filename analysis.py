@@ -0,0 +1,136 @@
+from board import Board
+from csp import ComponentCache, count_solutions
+from patterns import deduce
+from probability import mine_probabilities
+
+# Solver entry points with no screen, mouse, threads or printing: a board of
+# tile values goes in (99 unopened, 0 flag, -1 blank, 1-8 numbers) and the
+# tiles that are certainly safe or mines come out, with a mine probability
+# for every other unopened tile. Without the mine count, tiles away from the
+# numbers can't be weighed and only the frontier gets probabilities; the
+# same happens when the count fits no arrangement, which sets
+# mine_count_ignored
+
+
+class BoardAnalysis:
+    def __init__(self, safe, mines, probabilities, mine_count_ignored=False):
+        self.safe = safe
+        self.mines = mines
+        self.probabilities = probabilities
+        self.mine_count_ignored = mine_count_ignored
+
+    @property
+    def best_guess(self):
+        if not self.probabilities:
+            return None
+        return min(sorted(self.probabilities.items()), key=lambda item: item[1])[0]
+
+
+def split_components(constraints):
+    # Union-find over the tiles, so constraints that share one end up together
+    parent = {}
+
+    def find(tile):
+        while parent[tile] != tile:
+            parent[tile] = parent[parent[tile]]
+            tile = parent[tile]
+        return tile
+
+    for tiles, _ in constraints:
+        for tile in tiles:
+            parent.setdefault(tile, tile)
+        root = find(tiles[0])
+        for tile in tiles[1:]:
+            parent[find(tile)] = root
+
+    components = {}
+    for tiles, mines in constraints:
+        variables, comp_constraints = components.setdefault(find(tiles[0]), (set(), []))
+        variables.update(tiles)
+        comp_constraints.append((tiles, mines))
+    return [
+        (sorted(variables), constraints)
+        for variables, constraints in components.values()
+    ]
+
+
+def analyze_board(values, mines=None, cache=None):
+    rows = len(values)
+    cols = len(values[0])
+    board = Board(rows, cols)
+    board.update(values)
+    coords = board.coords
+
+    constraints = []
+    for i in sorted(board.frontier):
+        unopened = [j for j in board.neighbors[i] if board.values[j] == 99]
+        flagged = sum(1 for j in board.neighbors[i] if board.values[j] == 0)
+        constraints.append((unopened, board.values[i] - flagged))
+
+    # Subset and overlap deductions first; the exact count only runs on what
+    # they leave undecided
+    safe, certain_mines = deduce(constraints)
+    remaining = set()
+    reduced = set()
+    for tiles, count in constraints:
+        left = tuple(
+            coords[j] for j in tiles if j not in safe and j not in certain_mines
+        )
+        if left:
+            reduced.add((left, count - sum(1 for j in tiles if j in certain_mines)))
+            remaining.update(left)
+
+    solutions = []
+    for variables, comp_constraints in split_components(sorted(reduced)):
+        solution = None
+        if cache is not None:
+            solution = cache.get(variables, comp_constraints)
+        if solution is None:
+            solution = count_solutions(variables, comp_constraints)
+            if cache is not None:
+                cache.put(variables, comp_constraints, solution)
+        solutions.append(solution)
+
+    safe_tiles = {coords[j] for j in safe}
+    mine_tiles = {coords[j] for j in certain_mines}
+    for solution in solutions:
+        safe_tiles.update(solution.safe)
+        mine_tiles.update(solution.mines)
+
+    interior = {coords[j] for j in board.unopened} - remaining - safe_tiles - mine_tiles
+    mines_left = None
+    if mines is not None:
+        mines_left = mines - len(board.flagged) - len(certain_mines)
+    probabilities = mine_probabilities(solutions, interior, mines_left)
+    mine_count_ignored = probabilities is None
+    if mine_count_ignored:
+        probabilities = mine_probabilities(solutions, interior)
+    for tile in safe_tiles | mine_tiles:
+        probabilities.pop(tile, None)
+
+    return BoardAnalysis(
+        sorted(safe_tiles), sorted(mine_tiles), probabilities, mine_count_ignored
+    )
+
+
+def analyze_boards(boards, mines=None, cache_size=4096, workers=None):
+    # boards is a list of 2-D boards or a stacked (n, rows, cols) int8 array;
+    # components repeat a lot across positions, so one cache serves them all
+    if hasattr(boards, "tolist"):
+        boards = boards.tolist()
+    if workers and workers > 1 and len(boards) > 1:
+        import concurrent.futures
+
+        chunk = -(-len(boards) // workers)
+        chunks = [boards[i : i + chunk] for i in range(0, len(boards), chunk)]
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            results = executor.map(
+                analyze_boards,
+                chunks,
+                [mines] * len(chunks),
+                [cache_size] * len(chunks),
+            )
+            return [analysis for chunk_results in results for analysis in chunk_results]
+
+    cache = ComponentCache(cache_size)
+    return [analyze_board(values, mines, cache) for values in boards]
@@ -0,0 +1,61 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from capture import FileCapture, make_capture
+from frames import random_board, render_board
+
+parser = argparse.ArgumentParser(description="Screen capture benchmark")
+parser.add_argument(
+    "--backend",
+    choices=("file", "auto", "mss", "pyautogui"),
+    default="file",
+    help="Capture backend to time (screen backends need a display)",
+)
+parser.add_argument("--source", help="PNG/NPY file or directory for the file backend")
+parser.add_argument("--region", type=int, nargs=4, default=(0, 0, 600, 500))
+parser.add_argument("--grabs", type=int, default=200)
+
+
+def run(name, grabber, grabs):
+    frame = grabber.grab()
+    start = time.perf_counter()
+    for _ in range(grabs):
+        frame = grabber.grab()
+    elapsed = time.perf_counter() - start
+    grabber.close()
+
+    megabytes = frame.nbytes * grabs / 1e6
+    print(
+        f"{name:>10}: {grabs / elapsed:8.1f} grabs/s  "
+        f"{elapsed / grabs * 1000:7.3f} ms/grab  {megabytes / elapsed:8.1f} MB/s"
+    )
+
+
+def write_reference_frames(directory, count=10):
+    frames = np.stack(
+        [render_board(random_board(20, 24, seed=i)) for i in range(count)]
+    )
+    np.save(os.path.join(directory, "frames.npy"), frames)
+    png_directory = os.path.join(directory, "png")
+    os.mkdir(png_directory)
+    for i, frame in enumerate(frames):
+        Image.fromarray(frame).save(os.path.join(png_directory, f"{i:04}.png"))
+    return [("npy", os.path.join(directory, "frames.npy")), ("png", png_directory)]
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    if args.backend != "file":
+        run(args.backend, make_capture(args.backend, args.region), args.grabs)
+    elif args.source:
+        run("file", FileCapture(args.source), args.grabs)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            for name, source in write_reference_frames(directory):
+                run(name, FileCapture(source), args.grabs)
@@ -0,0 +1,173 @@
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+from calibration import standard_layouts
+from frames import expected_board, random_board, render_board
+from profiler import percentile
+from recognition import color_map, make_recognizer, recognizers
+from recording import load_recording, replay_frames
+
+parser = argparse.ArgumentParser(description="Board recognition benchmark")
+parser.add_argument("--rows", type=int, help="Custom board rows (default: all layouts)")
+parser.add_argument("--cols", type=int, help="Custom board columns")
+parser.add_argument("--tile-size", type=int, default=25)
+parser.add_argument("--frames", type=int, default=20, help="Frames per frame set")
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument(
+    "--recognizers",
+    nargs="+",
+    choices=sorted(recognizers),
+    default=sorted(recognizers),
+)
+parser.add_argument(
+    "--recording",
+    help="Also benchmark on frames from main.py --record, scored against --reference",
+)
+parser.add_argument("--reference", choices=sorted(recognizers), default="threaded")
+parser.add_argument(
+    "--alloc-frames",
+    type=int,
+    default=3,
+    help="Frames per run traced with tracemalloc (traced separately from timing)",
+)
+parser.add_argument("--json", help="Write the results as JSON to this file")
+
+
+def shift_colors(frame, rng, amount=6):
+    # A display profile nudging every channel, as on an uncalibrated machine
+    shift = rng.integers(-amount, amount + 1, size=3)
+    return np.clip(frame.astype(np.int16) + shift, 0, 255).astype(np.uint8)
+
+
+def synthetic_sets(rows, cols, tile_size, count, seed):
+    rng = np.random.default_rng(seed)
+    boards = [random_board(rows, cols, seed=seed + i) for i in range(count)]
+    clean = [render_board(board, tile_size, tile_size) for board in boards]
+    expected = [expected_board(board) for board in boards]
+    return {
+        "clean": (clean, expected),
+        "shifted": ([shift_colors(frame, rng) for frame in clean], expected),
+    }
+
+
+def recorded_set(path, reference, count):
+    meta, entries, tiles = load_recording(path)
+    rows, cols = meta["rows"], meta["cols"]
+    tile_width, tile_height = meta["tile_width"], meta["tile_height"]
+    colors = meta["palette"]
+    recognizer = make_recognizer(reference, rows, cols, tile_width, tile_height, colors)
+
+    frames = []
+    expected = []
+    for _, frame in replay_frames(meta, entries[:count], tiles):
+        frames.append(frame.copy())
+        recognizer.reset()
+        expected.append(recognizer.read(frame))
+    return (rows, cols, tile_width, tile_height, colors), frames, expected
+
+
+def run(name, geometry, frames, expected, alloc_frames):
+    rows, cols, tile_width, tile_height, colors = geometry
+    recognizer = make_recognizer(name, rows, cols, tile_width, tile_height, colors)
+    # Frames go in as arrays, as they come from the capture backends, so
+    # the PIL-based scanners pay for their conversion like they do live
+    inputs = frames
+
+    latencies = []
+    correct_tiles = 0
+    correct_boards = 0
+    for image, board in zip(inputs, expected):
+        recognizer.reset()
+        start = time.perf_counter()
+        result = recognizer.read(image)
+        latencies.append(time.perf_counter() - start)
+        matches = sum(
+            got == want
+            for got_row, want_row in zip(result, board)
+            for got, want in zip(got_row, want_row)
+        )
+        correct_tiles += matches
+        correct_boards += matches == rows * cols
+
+    peaks = []
+    for image in inputs[:alloc_frames]:
+        recognizer.reset()
+        tracemalloc.start()
+        recognizer.read(image)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        "frames": len(frames),
+        "latency_ms": {
+            "mean": sum(latencies) / len(latencies) * 1000,
+            "p50": percentile(latencies, 0.5) * 1000,
+            "p90": percentile(latencies, 0.9) * 1000,
+            "max": max(latencies) * 1000,
+        },
+        "frames_per_second": len(latencies) / sum(latencies),
+        "peak_alloc_kb": max(peaks) / 1024 if peaks else None,
+        "tile_accuracy": correct_tiles / (len(frames) * rows * cols),
+        "boards_correct": correct_boards,
+    }
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.rows and args.cols:
+        layouts = [(args.rows, args.cols)]
+    else:
+        layouts = sorted(standard_layouts)
+
+    cases = []
+    for rows, cols in layouts:
+        geometry = (rows, cols, args.tile_size, args.tile_size, color_map)
+        sets = synthetic_sets(rows, cols, args.tile_size, args.frames, args.seed)
+        for frame_set, (frames, expected) in sets.items():
+            cases.append((f"{rows}x{cols}", frame_set, geometry, frames, expected))
+    if args.recording:
+        geometry, frames, expected = recorded_set(
+            args.recording, args.reference, args.frames
+        )
+        cases.append(
+            (f"{geometry[0]}x{geometry[1]}", "recorded", geometry, frames, expected)
+        )
+
+    results = []
+    print(
+        f"{'recognizer':<12}{'board':<8}{'frames':<10}{'mean ms':>9}{'p90 ms':>9}"
+        f"{'fps':>9}{'peak KB':>9}{'accuracy':>10}"
+    )
+    for layout, frame_set, geometry, frames, expected in cases:
+        for name in args.recognizers:
+            result = run(name, geometry, frames, expected, args.alloc_frames)
+            result.update(recognizer=name, layout=layout, frame_set=frame_set)
+            results.append(result)
+            peak = result["peak_alloc_kb"]
+            print(
+                f"{name:<12}{layout:<8}{frame_set:<10}"
+                f"{result['latency_ms']['mean']:>9.2f}"
+                f"{result['latency_ms']['p90']:>9.2f}"
+                f"{result['frames_per_second']:>9.1f}"
+                f"{peak if peak is not None else 0:>9.0f}"
+                f"{result['tile_accuracy'] * 100:>9.1f}%"
+            )
+
+    if args.json:
+        report = {
+            "benchmark": "recognition",
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "config": vars(args),
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.json}")
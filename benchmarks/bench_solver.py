@@ -0,0 +1,263 @@
+import argparse
+import collections
+import contextlib
+import json
+import os
+import platform
+import random
+import time
+
+from analysis import analyze_board
+from board import Board
+from calibration import standard_layouts
+from dispatch import DryRunSink, InputDispatcher
+from profiler import NullProfiler, percentile
+from simulator import MinesweeperGame
+from solver import (
+    collect_constraints,
+    first_safe_tile,
+    guess_least_risky_tile,
+    process_board,
+    recognize_and_apply_patterns,
+    solve_constraints_concurrently,
+)
+from solver_pool import SolverPool
+
+stages = ("process", "patterns", "csp", "first-safe", "guess")
+frontier_buckets = (0, 25, 50, 100, 200)
+
+# The CSP solver used to give up on components over 50 variables and stop
+# enumerating after 1000 solutions; both are counted to see how often
+# positions would have fallen outside them
+old_variable_limit = 50
+old_solution_limit = 1000
+
+parser = argparse.ArgumentParser(description="Solver stage benchmark")
+parser.add_argument("--rows", type=int, help="Custom board rows (default: all layouts)")
+parser.add_argument("--cols", type=int, help="Custom board columns")
+parser.add_argument(
+    "--densities",
+    type=float,
+    nargs="+",
+    default=(0.12, 0.16, 0.21),
+    help="Mine densities to generate positions at",
+)
+parser.add_argument("--games", type=int, default=5, help="Games per board and density")
+parser.add_argument(
+    "--stride", type=int, default=1, help="Keep every Nth position of each game"
+)
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument(
+    "--cache-size",
+    type=int,
+    default=0,
+    help="CSP component cache size (default 0, so every position is solved)",
+)
+parser.add_argument("--json", help="Write the results as JSON to this file")
+
+
+class ComponentStats(NullProfiler):
+    # Collects the components solve_components hands to the profiler
+    def __init__(self):
+        self.components = []
+
+    def add_component(self, variables, solution):
+        self.components.append((len(variables), solution.total))
+
+
+def generate_positions(rows, cols, mines, games, stride, seed):
+    # Positions come from games played by the solver itself: every step
+    # opens the safe tiles and flags the mines it can prove, or opens the
+    # least risky tile, so the frontiers look like the ones the bot meets
+    positions = []
+    for g in range(games):
+        game = MinesweeperGame(rows, cols, mines, seed=seed + g)
+        game.reveal(rows // 2, cols // 2)
+        step = 0
+        while game.state == "playing":
+            values = game.board()
+            if step % stride == 0:
+                positions.append(values)
+            step += 1
+            result = analyze_board(values, mines)
+            for r, c in result.mines:
+                game.toggle_flag(r, c)
+            for r, c in result.safe:
+                game.reveal(r, c)
+            if not result.safe and not result.mines:
+                if result.best_guess is None:
+                    break
+                game.reveal(*result.best_guess)
+    return positions
+
+
+def run_stage(stage, values, mines, pool):
+    # Each stage runs alone on a fresh board, so its latency and whether it
+    # finds a move don't depend on what the stages before it did
+    rows, cols = len(values), len(values[0])
+    board = Board(rows, cols)
+    board.update(values)
+    tile_grid = [[(col, row) for col in range(cols)] for row in range(rows)]
+    dispatcher = InputDispatcher(tile_grid, DryRunSink(), order="queue")
+    stats = ComponentStats()
+
+    start = time.perf_counter()
+    if stage == "process":
+        resolved = process_board(board, dispatcher)
+    elif stage == "patterns":
+        resolved = recognize_and_apply_patterns(board, dispatcher)
+    elif stage == "csp":
+        variables, constraints = collect_constraints(board)
+        safe_tiles, mine_tiles = solve_constraints_concurrently(
+            variables, constraints, None, pool, stats
+        )
+        resolved = bool(safe_tiles or mine_tiles)
+    elif stage == "first-safe":
+        variables, constraints = collect_constraints(board)
+        resolved = first_safe_tile(variables, constraints, None, pool) is not None
+    else:
+        resolved = guess_least_risky_tile(board, mines, pool) is not None
+    elapsed = time.perf_counter() - start
+    return elapsed, resolved, stats.components
+
+
+def bucket_name(frontier):
+    lower = max(b for b in frontier_buckets if b <= frontier)
+    upper = [b for b in frontier_buckets if b > lower]
+    return f"{lower}-{upper[0] - 1}" if upper else f"{lower}+"
+
+
+def latency_ms(latencies):
+    return {
+        "p50": percentile(latencies, 0.5) * 1000,
+        "p90": percentile(latencies, 0.9) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "max": max(latencies) * 1000,
+    }
+
+
+def run(positions, mines, pool):
+    latencies = collections.defaultdict(list)
+    by_frontier = collections.defaultdict(lambda: collections.defaultdict(list))
+    resolved = collections.Counter()
+    first_resolver = collections.Counter()
+    components = []
+
+    for values in positions:
+        board = Board(len(values), len(values[0]))
+        board.update(values)
+        bucket = bucket_name(len(collect_constraints(board)[0]))
+        first = None
+        for stage in stages:
+            elapsed, found, stage_components = run_stage(stage, values, mines, pool)
+            latencies[stage].append(elapsed)
+            by_frontier[bucket][stage].append(elapsed)
+            resolved[stage] += found
+            if found and first is None:
+                first = stage
+            if stage == "csp":
+                components.extend(stage_components)
+        first_resolver[first] += 1
+
+    count = len(positions)
+    return {
+        "positions": count,
+        "stages": {
+            stage: dict(
+                latency_ms=latency_ms(latencies[stage]),
+                resolved=resolved[stage] / count,
+                first_resolver=first_resolver[stage] / count,
+            )
+            for stage in stages
+        },
+        "by_frontier": {
+            bucket: {
+                "positions": len(by_frontier[bucket]["process"]),
+                **{stage: latency_ms(by_frontier[bucket][stage]) for stage in stages},
+            }
+            for bucket in map(bucket_name, frontier_buckets)
+            if bucket in by_frontier
+        },
+        "csp_components": {
+            "count": len(components),
+            "largest": max((size for size, _ in components), default=0),
+            "most_solutions": max((total for _, total in components), default=0),
+            "over_variable_limit": sum(
+                size > old_variable_limit for size, _ in components
+            ),
+            "over_solution_limit": sum(
+                total > old_solution_limit for _, total in components
+            ),
+        },
+    }
+
+
+def print_result(layout, density, result):
+    print(f"\n{layout} at {density:.0%} mines, {result['positions']} positions")
+    print(
+        f"{'stage':<10}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        f"{'resolves':>10}{'first':>8}"
+    )
+    for stage, summary in result["stages"].items():
+        latency = summary["latency_ms"]
+        print(
+            f"{stage:<10}{latency['p50']:>9.3f}{latency['p90']:>9.3f}"
+            f"{latency['p99']:>9.3f}{latency['max']:>9.3f}"
+            f"{summary['resolved'] * 100:>9.1f}%{summary['first_resolver'] * 100:>7.1f}%"
+        )
+    print(
+        f"{'frontier':<10}{'positions':>10}"
+        + "".join(f"{s + ' p90':>16}" for s in stages)
+    )
+    for bucket, summary in result["by_frontier"].items():
+        print(
+            f"{bucket:<10}{summary['positions']:>10}"
+            + "".join(f"{summary[stage]['p90']:>16.3f}" for stage in stages)
+        )
+    csp = result["csp_components"]
+    print(
+        f"CSP components: {csp['count']}, largest {csp['largest']} variables, "
+        f"{csp['over_variable_limit']} over {old_variable_limit} variables, "
+        f"{csp['over_solution_limit']} over {old_solution_limit} solutions "
+        f"(most: {csp['most_solutions']})"
+    )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.rows and args.cols:
+        layouts = [(args.rows, args.cols)]
+    else:
+        layouts = sorted(standard_layouts)
+
+    random.seed(args.seed)
+    pool = SolverPool("threads", cache_size=args.cache_size)
+    results = []
+    for rows, cols in layouts:
+        for density in args.densities:
+            mines = min(max(1, round(density * rows * cols)), rows * cols - 1)
+            positions = generate_positions(
+                rows, cols, mines, args.games, args.stride, args.seed
+            )
+            if not positions:
+                continue
+            with open(os.devnull, "w") as devnull:
+                with contextlib.redirect_stdout(devnull):
+                    result = run(positions, mines, pool)
+            result.update(layout=f"{rows}x{cols}", density=density, mines=mines)
+            results.append(result)
+            print_result(result["layout"], density, result)
+    pool.shutdown()
+
+    if args.json:
+        report = {
+            "benchmark": "solver",
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "config": vars(args),
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.json}")
@@ -0,0 +1,137 @@
+import array
+import functools
+
+
+def get_neighbors(row, col, board):
+    neighbors = []
+    rows = len(board)
+    cols = len(board[0])
+
+    for dr in [-1, 0, 1]:
+        for dc in [-1, 0, 1]:
+            if dr == 0 and dc == 0:
+                continue  # Skip the tile itself
+            r = row + dr
+            c = col + dc
+            if 0 <= r < rows and 0 <= c < cols:
+                neighbors.append((r, c))
+    return neighbors
+
+
+UNREAD = -128
+
+
+@functools.lru_cache(maxsize=None)
+def neighbor_index(rows, cols):
+    # Flat offsets of every tile's neighbours, built once per board size
+    return tuple(
+        tuple(
+            (row + dr) * cols + col + dc
+            for dr in (-1, 0, 1)
+            for dc in (-1, 0, 1)
+            if (dr or dc) and 0 <= row + dr < rows and 0 <= col + dc < cols
+        )
+        for row in range(rows)
+        for col in range(cols)
+    )
+
+
+class Board:
+    stages = ("process", "patterns", "book", "csp")
+
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.values = array.array("b", [UNREAD]) * self.size
+        self.neighbors = neighbor_index(rows, cols)
+        self.coords = [(r, c) for r in range(rows) for c in range(cols)]
+        self.filled = False
+        # Tile sets hold flat indices
+        self.frontier = set()  # Numbered tiles with unopened neighbours
+        self.unopened = set()
+        self.flagged = set()
+        self.changed = set()
+        self.marked = set()
+        # Frontier tiles each stage has not looked at since their neighbourhood
+        # last changed
+        self.pending = {stage: set() for stage in self.stages}
+
+    def reset(self):
+        self.__init__(self.rows, self.cols)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, row):
+        return self.values[row * self.cols : (row + 1) * self.cols]
+
+    def __iter__(self):
+        return (self[row] for row in range(self.rows))
+
+    def index(self, row, col):
+        return row * self.cols + col
+
+    def update(self, values, changed=None):
+        if changed is None or not self.filled:
+            candidates = range(self.size)
+        else:
+            # Tiles the solvers marked locally may not have changed on screen yet
+            candidates = {r * self.cols + c for r, c in changed} | self.marked
+        self.marked = set()
+        self.filled = True
+
+        cells = self.values
+        coords = self.coords
+        self.changed = set()
+        for i in candidates:
+            r, c = coords[i]
+            val = values[r][c]
+            if cells[i] != val:
+                cells[i] = val
+                self.changed.add(i)
+
+        self.refresh(self.changed)
+        return self.changed
+
+    def mark(self, i, value):
+        self.values[i] = value
+        self.marked.add(i)
+        self.refresh((i,))
+
+    def refresh(self, indices):
+        values = self.values
+        neighbors = self.neighbors
+
+        affected = set()
+        for i in indices:
+            affected.add(i)
+            affected.update(neighbors[i])
+            if values[i] == 99:
+                self.unopened.add(i)
+            else:
+                self.unopened.discard(i)
+            if values[i] == 0:
+                self.flagged.add(i)
+            else:
+                self.flagged.discard(i)
+
+        for i in affected:
+            val = values[i]
+            if 1 <= val <= 8 and any(values[j] == 99 for j in neighbors[i]):
+                self.frontier.add(i)
+                for pending in self.pending.values():
+                    pending.add(i)
+            else:
+                self.frontier.discard(i)
+                for pending in self.pending.values():
+                    pending.discard(i)
+
+    def take_dirty(self, stage):
+        cells = sorted(self.pending[stage])
+        self.pending[stage].clear()
+        return cells
+
+    def unopened_near(self, indices):
+        values = self.values
+        return {j for i in indices for j in self.neighbors[i] if values[j] == 99}
@@ -0,0 +1,171 @@
+import json
+import os
+
+import numpy as np
+
+from capture import make_capture, screen_region
+from recognition import color_map, opened_colors, pack_rgb, unopened_colors
+
+standard_layouts = {(8, 10): 10, (14, 18): 40, (20, 24): 99}
+
+# Light and dark shades of the checkerboard, unopened and opened
+light_colors = [unopened_colors[0], opened_colors[0]]
+dark_colors = [unopened_colors[1], opened_colors[1]]
+
+
+def near(pixels, colors, tolerance=24):
+    pixels = pixels.astype(np.int16)
+    mask = np.zeros(pixels.shape[:2], dtype=bool)
+    for color in colors:
+        mask |= (
+            np.abs(pixels - np.array(color, dtype=np.int16)).max(axis=2) <= tolerance
+        )
+    return mask
+
+
+def longest_run(flags):
+    best = (0, 0)
+    start = None
+    for i, flag in enumerate(list(flags) + [False]):
+        if flag and start is None:
+            start = i
+        elif not flag and start is not None:
+            if i - start > best[1] - best[0]:
+                best = (start, i)
+            start = None
+    return best
+
+
+def find_board(frame):
+    board = near(frame, light_colors + dark_colors)
+    row_counts = board.sum(axis=1)
+    if not row_counts.max():
+        raise ValueError("No Minesweeper board found on screen")
+    top, bottom = longest_run(row_counts >= row_counts.max() // 2)
+    col_counts = board[top:bottom].sum(axis=0)
+    left, right = longest_run(col_counts >= col_counts.max() // 2)
+    return left, top, right, bottom
+
+
+def count_tiles(shades):
+    # Tiles alternate light and dark along a line; digits and flags sit inside
+    # a tile, so unknown pixels take the shade before them
+    transitions = []
+    for line in shades:
+        known = line >= 0
+        if not known.any():
+            continue
+        index = np.where(known, np.arange(len(line)), 0)
+        filled = line[np.maximum.accumulate(index)]
+        filled = filled[np.argmax(known) :]
+        transitions.append(int(np.count_nonzero(filled[1:] != filled[:-1])))
+    return int(np.median(transitions)) + 1
+
+
+def find_grid(frame, box, samples=15):
+    left, top, right, bottom = box
+    region = frame[top:bottom, left:right]
+    shades = np.full(region.shape[:2], -1, dtype=np.int8)
+    shades[near(region, dark_colors, 4)] = 0
+    shades[near(region, light_colors, 4)] = 1
+
+    height, width = shades.shape
+    ys = np.linspace(0, height - 1, samples).astype(int)
+    xs = np.linspace(0, width - 1, samples).astype(int)
+    cols = count_tiles(shades[ys])
+    rows = count_tiles(shades[:, xs].T)
+
+    # Snap to the closest standard layout unless the board is clearly custom
+    layout = min(standard_layouts, key=lambda rc: abs(rc[0] - rows) + abs(rc[1] - cols))
+    if abs(layout[0] - rows) + abs(layout[1] - cols) <= 2:
+        rows, cols = layout
+    return rows, cols
+
+
+def build_palette(frame, box, min_pixels=20, max_distance=60, per_value=2):
+    left, top, right, bottom = box
+    region = frame[top:bottom, left:right]
+
+    palette = {}
+    greens = region[near(region, unopened_colors)]
+    keys, counts = np.unique(pack_rgb(greens), return_counts=True)
+    for key in keys[np.argsort(counts)[::-1][: len(unopened_colors)]]:
+        key = int(key)
+        palette[(key >> 16, (key >> 8) & 255, key & 255)] = 99
+
+    # Everything that is not tile background is a digit or flag candidate;
+    # the most common exact colours near each reference colour become its
+    # palette entries
+    background = near(region, light_colors + dark_colors)
+    keys, counts = np.unique(pack_rgb(region[~background]), return_counts=True)
+    references = [(color, value) for color, value in color_map.items() if value != 99]
+    found = {}
+    for key, count in sorted(zip(keys, counts), key=lambda kc: -kc[1]):
+        if count < min_pixels:
+            break
+        key = int(key)
+        color = (key >> 16, (key >> 8) & 255, key & 255)
+        reference, value = min(
+            references, key=lambda rv: sum((a - b) ** 2 for a, b in zip(rv[0], color))
+        )
+        distance = sum((a - b) ** 2 for a, b in zip(reference, color)) ** 0.5
+        if distance <= max_distance and len(found.setdefault(value, [])) < per_value:
+            found[value].append(color)
+
+    for color, value in color_map.items():
+        if value != 99 and value not in found:
+            palette[color] = value
+    for value, colors in found.items():
+        for color in colors:
+            palette[color] = value
+    return palette, sorted(found)
+
+
+def calibrate(frame, offset=(0, 0)):
+    box = find_board(frame)
+    rows, cols = find_grid(frame, box)
+    palette, observed = build_palette(frame, box)
+    left, top, right, bottom = box
+    profile = {
+        "left": left + offset[0],
+        "top": top + offset[1],
+        "right": right + offset[0],
+        "bottom": bottom + offset[1],
+        "rows": rows,
+        "cols": cols,
+        "palette": palette,
+    }
+    print(
+        f"Found a {rows}x{cols} board at ({profile['left']}, {profile['top']})-"
+        f"({profile['right']}, {profile['bottom']}), "
+        f"tiles {(right - left) / cols:.1f}x{(bottom - top) / rows:.1f}px, "
+        f"palette colours seen for {observed or 'no digits'}"
+    )
+    return profile
+
+
+def calibrate_screen(backend="auto"):
+    region = screen_region()
+    grabber = make_capture(backend, region)
+    try:
+        frame = grabber.grab().copy()
+    finally:
+        grabber.close()
+    return calibrate(frame, region[:2])
+
+
+def save_calibration(path, profile):
+    data = dict(profile)
+    data["palette"] = [[*color, value] for color, value in profile["palette"].items()]
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    print(f"Saved calibration to {path}")
+
+
+def load_calibration(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    data["palette"] = {(r, g, b): value for r, g, b, value in data["palette"]}
+    return data
@@ -0,0 +1,115 @@
+import itertools
+import os
+
+import numpy as np
+from PIL import Image
+
+try:
+    import mss
+except ImportError:
+    mss = None
+
+
+class CaptureBackend:
+    def __init__(self):
+        self.buffer = None
+
+    def fill(self, pixels):
+        # Frames are copied into one buffer that is reused for every grab, so
+        # callers that keep a frame past the next grab must copy it
+        pixels = pixels[..., :3]
+        if self.buffer is None or self.buffer.shape != pixels.shape:
+            self.buffer = np.empty(pixels.shape, dtype=np.uint8)
+        np.copyto(self.buffer, pixels)
+        return self.buffer
+
+    def grab(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MssCapture(CaptureBackend):
+    def __init__(self, region):
+        super().__init__()
+        left, top, width, height = region
+        self.monitor = {"left": left, "top": top, "width": width, "height": height}
+        self.grabber = mss.mss()
+
+    def grab(self):
+        shot = self.grabber.grab(self.monitor)
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8)
+        bgra = bgra.reshape(shot.height, shot.width, 4)
+        return self.fill(bgra[..., 2::-1])
+
+    def close(self):
+        self.grabber.close()
+
+
+class PyAutoGuiCapture(CaptureBackend):
+    def __init__(self, region):
+        super().__init__()
+        import pyautogui
+
+        self.pyautogui = pyautogui
+        self.region = region
+
+    def grab(self):
+        screenshot = self.pyautogui.screenshot(region=self.region)
+        return self.fill(np.asarray(screenshot.convert("RGB")))
+
+
+def load_frames(path):
+    if os.path.isdir(path):
+        frames = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith((".png", ".npy")):
+                frames.extend(load_frames(os.path.join(path, name)))
+        return frames
+
+    if path.endswith(".npy"):
+        frames = np.load(path, mmap_mode="r")
+        if frames.ndim == 3:
+            return [frames]
+        return list(frames)
+
+    return [np.asarray(Image.open(path).convert("RGB"))]
+
+
+class FileCapture(CaptureBackend):
+    def __init__(self, path, loop=True):
+        super().__init__()
+        self.frames = load_frames(path)
+        if not self.frames:
+            raise ValueError(f"No PNG or NPY frames found in {path}")
+        self.source = itertools.cycle(self.frames) if loop else iter(self.frames)
+
+    def grab(self):
+        frame = next(self.source, None)
+        if frame is None:
+            return None
+        return self.fill(frame)
+
+
+capture_backends = ("auto", "mss", "pyautogui")
+
+
+def screen_region():
+    # The whole desktop, spanning every monitor when mss is available
+    if mss is not None:
+        with mss.mss() as grabber:
+            monitor = grabber.monitors[0]
+        return monitor["left"], monitor["top"], monitor["width"], monitor["height"]
+    import pyautogui
+
+    width, height = pyautogui.size()
+    return 0, 0, width, height
+
+
+def make_capture(name, region):
+    if name == "auto":
+        name = "mss" if mss is not None else "pyautogui"
+    if name == "mss":
+        return MssCapture(region)
+    return PyAutoGuiCapture(region)
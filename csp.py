@@ -0,0 +1,371 @@
+import collections
+import threading
+
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+
+def add_shifted(target, source, shift):
+    if len(target) < len(source) + shift:
+        target.extend([0] * (len(source) + shift - len(target)))
+    for k, count in enumerate(source):
+        target[k + shift] += count
+    return target
+
+
+def convolve(a, b):
+    result = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                result[i + j] += x * y
+    return result
+
+
+class ComponentSolution:
+    def __init__(self, variables, counts, mine_counts):
+        self.variables = variables
+        # counts[k] is the number of solutions placing exactly k mines, and
+        # mine_counts[var][k] how many of those put a mine on var
+        self.counts = counts
+        self.mine_counts = mine_counts
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    @property
+    def safe(self):
+        if not self.total:
+            return []
+        return [var for var in self.variables if not any(self.mine_counts[var])]
+
+    @property
+    def mines(self):
+        total = self.total
+        if not total:
+            return []
+        return [var for var in self.variables if sum(self.mine_counts[var]) == total]
+
+
+def encode(variables, constraints):
+    index = {var: i for i, var in enumerate(variables)}
+    encoded = []
+    for var_tuple, required_mines in constraints:
+        mask = 0
+        for var in var_tuple:
+            mask |= 1 << index[var]
+        encoded.append((mask, required_mines))
+    return encoded
+
+
+def active_width(variables, constraints):
+    width = 0
+    encoded = encode(variables, constraints)
+    starts = collections.Counter((mask & -mask).bit_length() - 1 for mask, _ in encoded)
+    ends = collections.Counter(mask.bit_length() - 1 for mask, _ in encoded)
+    active = 0
+    for i in range(len(variables)):
+        active += starts[i]
+        width = max(width, active)
+        active -= ends[i]
+    return width
+
+
+def breadth_first_order(variables, constraints):
+    adj = collections.defaultdict(set)
+    for var_tuple, _ in constraints:
+        for var in var_tuple:
+            adj[var].update(var_tuple)
+
+    order = []
+    visited = set()
+    for start in variables:
+        if start in visited:
+            continue
+        visited.add(start)
+        q = collections.deque([start])
+        while q:
+            var = q.popleft()
+            order.append(var)
+            for neighbor in sorted(adj[var] - visited):
+                visited.add(neighbor)
+                q.append(neighbor)
+    return order
+
+
+def order_variables(variables, constraints):
+    # The number of states kept per step grows with how many constraints are
+    # open at once, so pick the ordering that keeps that smallest
+    candidates = [
+        sorted(variables),
+        sorted(variables, key=lambda var: (var[1], var[0])),
+        breadth_first_order(sorted(variables), constraints),
+    ]
+    return min(candidates, key=lambda order: active_width(order, constraints))
+
+
+def count_solutions(variables, constraints):
+    variables = order_variables(variables, constraints)
+    encoded = encode(variables, constraints)
+    n = len(variables)
+
+    starts = [[] for _ in range(n)]
+    for c, (mask, _) in enumerate(encoded):
+        starts[(mask & -mask).bit_length() - 1].append(c)
+
+    # Forward pass: each state holds the remaining mine count of every
+    # constraint that has started but not yet ended, and maps to the number of
+    # partial assignments reaching it by mines placed so far
+    active = ()
+    layers = [{(): [1]}]
+    mine_parts = []
+    steps = []
+    for i in range(n):
+        bit = 1 << i
+        during = active + tuple(starts[i])
+        initial = tuple(encoded[c][1] for c in starts[i])
+        touches = [bool(encoded[c][0] & bit) for c in during]
+        remaining = [popcount(encoded[c][0] >> (i + 1)) for c in during]
+        keep = [j for j, c in enumerate(during) if remaining[j]]
+
+        layer = {}
+        mine_part = {}
+        transitions = []
+        for state, counts in layers[-1].items():
+            residuals = state + initial
+            for value in (0, 1):
+                next_residuals = []
+                for j, residual in enumerate(residuals):
+                    if touches[j]:
+                        residual -= value
+                    if residual < 0 or residual > remaining[j]:
+                        break
+                    next_residuals.append(residual)
+                else:
+                    next_state = tuple(next_residuals[j] for j in keep)
+                    add_shifted(layer.setdefault(next_state, []), counts, value)
+                    if value:
+                        add_shifted(mine_part.setdefault(next_state, []), counts, 1)
+                    transitions.append((state, value, next_state))
+
+        active = tuple(during[j] for j in keep)
+        layers.append(layer)
+        mine_parts.append(mine_part)
+        steps.append(transitions)
+
+    # Backward pass: ways to finish from each state by mines still to place
+    backward = {(): [1]}
+    mine_counts = {}
+    for i in range(n - 1, -1, -1):
+        mines = []
+        for state, part in mine_parts[i].items():
+            if state in backward:
+                add_shifted(mines, convolve(part, backward[state]), 0)
+        mine_counts[variables[i]] = mines
+
+        previous = {}
+        for state, value, next_state in steps[i]:
+            if next_state in backward:
+                add_shifted(previous.setdefault(state, []), backward[next_state], value)
+        backward = previous
+
+    counts = layers[-1].get((), [0])
+    return ComponentSolution(variables, counts, mine_counts)
+
+
+class SearchLimit(Exception):
+    pass
+
+
+class AssignmentSearch:
+    # Depth-first search for any one arrangement of mines that satisfies every
+    # constraint, with unit propagation. Much cheaper than counting them all
+    # when only existence matters; gives up with SearchLimit after `limit`
+    # branches
+    def __init__(self, variables, constraints, limit=20000):
+        self.order = breadth_first_order(sorted(variables), constraints)
+        self.limit = limit
+        index = {var: i for i, var in enumerate(self.order)}
+        self.index = index
+        self.members = [
+            [index[var] for var in var_tuple] for var_tuple, _ in constraints
+        ]
+        self.touching = [[] for _ in self.order]
+        for c, tiles in enumerate(self.members):
+            for i in tiles:
+                self.touching[i].append(c)
+        self.need = [required_mines for _, required_mines in constraints]
+        self.free = [len(tiles) for tiles in self.members]
+        self.values = [None] * len(self.order)
+
+    def assign(self, i, value, trail):
+        values = self.values
+        need = self.need
+        free = self.free
+        stack = [(i, value)]
+        while stack:
+            i, value = stack.pop()
+            if values[i] is not None:
+                if values[i] != value:
+                    return False
+                continue
+            values[i] = value
+            trail.append(i)
+            for c in self.touching[i]:
+                free[c] -= 1
+                need[c] -= value
+            for c in self.touching[i]:
+                if need[c] < 0 or need[c] > free[c]:
+                    return False
+                if free[c] and need[c] in (0, free[c]):
+                    forced = 1 if need[c] else 0
+                    stack.extend(
+                        (j, forced) for j in self.members[c] if values[j] is None
+                    )
+        return True
+
+    def undo(self, trail):
+        for i in reversed(trail):
+            for c in self.touching[i]:
+                self.free[c] += 1
+                self.need[c] += self.values[i]
+            self.values[i] = None
+
+    def find(self, fixed=None):
+        # The search state is restored before returning, so one instance can
+        # answer many queries
+        values = self.values
+        frames = []
+        base = []
+        try:
+            for var, value in (fixed or {}).items():
+                if not self.assign(self.index[var], value, base):
+                    return None
+
+            # Safe first, since most frontier tiles are; backtracking is
+            # iterative so components of any size fit
+            k, value = 0, 0
+            branches = 0
+            while True:
+                while k < len(values) and values[k] is not None:
+                    k += 1
+                if k == len(values):
+                    return dict(zip(self.order, values))
+                branches += 1
+                if branches > self.limit:
+                    raise SearchLimit
+                trail = []
+                assigned = self.assign(k, value, trail)
+                frames.append((k, value, trail))
+                if assigned:
+                    k, value = k + 1, 0
+                    continue
+                # Back up to the latest tile still to be tried as a mine
+                while True:
+                    if not frames:
+                        return None
+                    k, value, trail = frames.pop()
+                    self.undo(trail)
+                    if value == 0:
+                        value = 1
+                        break
+        finally:
+            for _, _, trail in reversed(frames):
+                self.undo(trail)
+            self.undo(base)
+
+
+def proven_safe(variables, constraints):
+    # Yields the tiles no arrangement can put a mine on, one at a time as each
+    # is proven. A tile only needs one failed "can this be a mine?" search,
+    # and every arrangement found along the way rules out the tiles it mines
+    search = AssignmentSearch(variables, constraints)
+    try:
+        witness = search.find()
+    except SearchLimit:
+        return
+    if witness is None:
+        return
+    candidates = [var for var in variables if not witness[var]]
+    while candidates:
+        var = candidates.pop(0)
+        try:
+            example = search.find({var: 1})
+        except SearchLimit:
+            continue
+        if example is None:
+            yield var
+        else:
+            candidates = [other for other in candidates if not example[other]]
+
+
+def canonical_component(variables, constraints):
+    # Translate to coordinates relative to the component's top-left corner so
+    # the same local pattern matches anywhere on the board
+    top = min(r for r, _ in variables)
+    left = min(c for _, c in variables)
+
+    def shift(var):
+        return var[0] - top, var[1] - left
+
+    key_vars = tuple(sorted(shift(var) for var in variables))
+    key_constraints = tuple(
+        sorted(
+            (tuple(sorted(shift(var) for var in var_tuple)), mines)
+            for var_tuple, mines in constraints
+        )
+    )
+    return (top, left), (key_vars, key_constraints)
+
+
+class ComponentCache:
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, variables, constraints):
+        (top, left), key = canonical_component(variables, constraints)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+
+        counts, mine_counts = entry
+        ordered = [(r + top, c + left) for r, c in key[0]]
+        return ComponentSolution(ordered, counts, dict(zip(ordered, mine_counts)))
+
+    def contains(self, variables, constraints):
+        _, key = canonical_component(variables, constraints)
+        with self.lock:
+            return key in self.entries
+
+    def put(self, variables, constraints, solution):
+        if self.max_size <= 0:
+            return
+        (top, left), key = canonical_component(variables, constraints)
+        mine_counts = tuple(
+            solution.mine_counts[(r + top, c + left)] for r, c in key[0]
+        )
+        with self.lock:
+            self.entries[key] = (solution.counts, mine_counts)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return (
+            f"CSP cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), "
+            f"{self.evictions} evictions, {len(self.entries)} entries"
+        )
@@ -0,0 +1,122 @@
+import math
+
+click_orders = ("nearest", "serpentine", "queue")
+
+
+class PyAutoGuiSink:
+    def __init__(self):
+        import pyautogui
+
+        pyautogui.PAUSE = 0
+        self.pyautogui = pyautogui
+
+    def click(self, x, y, button):
+        self.pyautogui.click(x, y, button=button, duration=0)
+
+
+class DryRunSink:
+    def __init__(self):
+        self.clicks = []
+
+    def click(self, x, y, button):
+        self.clicks.append((x, y, button))
+
+
+def path_length(points, start=None):
+    travel = 0.0
+    previous = start
+    for point in points:
+        if previous is not None:
+            travel += math.dist(previous, point)
+        previous = point
+    return travel
+
+
+def serpentine_order(moves):
+    return sorted(
+        moves, key=lambda move: (move[0], move[1] if move[0] % 2 == 0 else -move[1])
+    )
+
+
+def nearest_order(moves, tile_grid, start=None):
+    remaining = list(moves)
+    ordered = []
+    position = start
+    while remaining:
+        if position is None:
+            move = min(remaining)
+        else:
+            move = min(
+                remaining,
+                key=lambda m: (math.dist(position, tile_grid[m[0]][m[1]]), m),
+            )
+        remaining.remove(move)
+        ordered.append(move)
+        position = tile_grid[move[0]][move[1]]
+    return ordered
+
+
+class InputDispatcher:
+    def __init__(self, tile_grid, sink, order="nearest"):
+        self.tile_grid = tile_grid
+        self.sink = sink
+        self.order = order
+        self.cursor = None
+        self.pending = []
+        self.requested = []
+        self.queued = 0
+        self.dropped = 0
+        self.sent = 0
+        self.travel = 0.0
+        self.naive_travel = 0.0
+
+    def queue(self, row, col, button, board=None):
+        self.queued += 1
+        self.requested.append((row, col, button))
+        # Only unopened tiles can be clicked or flagged, and a tile gets at
+        # most one move per batch
+        if board is not None and board.values[board.index(row, col)] != 99:
+            self.dropped += 1
+            return False
+        if any(move[:2] == (row, col) for move in self.pending):
+            self.dropped += 1
+            return False
+        self.pending.append((row, col, button))
+        return True
+
+    def left(self, row, col, board=None):
+        return self.queue(row, col, "left", board)
+
+    def right(self, row, col, board=None):
+        return self.queue(row, col, "right", board)
+
+    def flush(self):
+        if self.order == "serpentine":
+            moves = serpentine_order(self.pending)
+        elif self.order == "nearest":
+            moves = nearest_order(self.pending, self.tile_grid, self.cursor)
+        else:
+            moves = list(self.pending)
+
+        points = [self.tile_grid[r][c] for r, c, _ in moves]
+        naive_points = [self.tile_grid[r][c] for r, c, _ in self.requested]
+        self.naive_travel += path_length(naive_points, self.cursor)
+        self.travel += path_length(points, self.cursor)
+
+        for (x, y), (_, _, button) in zip(points, moves):
+            self.sink.click(x, y, button)
+        if points:
+            self.cursor = points[-1]
+
+        self.sent += len(moves)
+        self.pending = []
+        self.requested = []
+        return moves
+
+    def summary(self):
+        saved = self.naive_travel - self.travel
+        return (
+            f"Input: {self.sent} clicks sent of {self.queued} queued "
+            f"({self.dropped} dropped), cursor travel {self.travel:.0f}px "
+            f"({saved:.0f}px saved vs unordered)"
+        )
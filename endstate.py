@@ -0,0 +1,84 @@
+import numpy as np
+
+from calibration import dark_colors, light_colors, near
+from recognition import scan_area
+
+# Revealed mines fill their tile with one of these, with a darker dot on top
+mine_colors = [
+    (219, 50, 54),
+    (72, 133, 237),
+    (0, 135, 68),
+    (244, 194, 13),
+    (182, 72, 242),
+    (237, 68, 181),
+    (244, 132, 13),
+    (72, 230, 241),
+]
+
+
+def corner_insets(tile_width, tile_height, inset=None):
+    # 3 pixels on 25-pixel tiles, scaled with the pitch: a fixed inset lands
+    # inside the digits on small tiles. On tiles wider than the scan box the
+    # points stay in the margin around it
+    offset_x, offset_y, _, _ = scan_area(tile_width, tile_height)
+    insets = []
+    for pitch, offset in ((tile_width, offset_x), (tile_height, offset_y)):
+        size = round(pitch * 3 / 25) if inset is None else inset
+        if offset:
+            size = min(size, offset - 1)
+        insets.append(max(0, min(size, (pitch - 1) // 2)))
+    return insets
+
+
+class EndStateDetector:
+    def __init__(self, rows, cols, tile_width, tile_height, mines=None, inset=None):
+        self.rows = rows
+        self.cols = cols
+        self.mines = mines
+        self.mines_seen = 0
+        # Four points just inside each tile's corners: digits and flags never
+        # reach them, but a revealed mine colours the whole tile
+        inset_x, inset_y = corner_insets(tile_width, tile_height, inset)
+        ys = []
+        xs = []
+        for row in range(rows):
+            for col in range(cols):
+                top = row * tile_height
+                left = col * tile_width
+                for dy in (inset_y, tile_height - 1 - inset_y):
+                    for dx in (inset_x, tile_width - 1 - inset_x):
+                        ys.append(top + dy)
+                        xs.append(left + dx)
+        self.ys = np.array(ys)
+        self.xs = np.array(xs)
+
+    def check(self, frame, overlay_fraction=0.5):
+        sample = frame[self.ys, self.xs][None]
+        mine = near(sample, mine_colors, 20)[0].reshape(-1, 4)
+        # The end-of-game overlay dims the whole board, so most corners stop
+        # matching any tile colour
+        board = near(sample, light_colors + dark_colors)[0]
+
+        mine_tiles = int((mine.sum(axis=1) >= 3).sum())
+        if mine_tiles:
+            self.mines_seen = mine_tiles
+            return "lost"
+
+        if board.mean() < overlay_fraction:
+            return "lost" if self.mines_seen else "won"
+        return None
+
+    def overlay(self, frame, overlay_fraction=0.5):
+        # The end-of-game overlay dims the whole board, so most corners stop
+        # matching any tile colour
+        sample = frame[self.ys, self.xs][None]
+        return near(sample, light_colors + dark_colors)[0].mean() < overlay_fraction
+
+    def solved(self, board):
+        # Every safe tile is open once only the mines are left unopened
+        if self.mines is None:
+            return False
+        return len(board.unopened) + len(board.flagged) == self.mines
+
+    def reset(self):
+        self.mines_seen = 0
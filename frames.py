@@ -0,0 +1,64 @@
+import random
+
+import numpy as np
+
+from endstate import mine_colors
+from recognition import color_map, opened_colors, unopened_colors
+
+number_colors = {}
+for color, value in color_map.items():
+    if value != 99:
+        number_colors.setdefault(value, color)
+
+
+def render_board(board, tile_width=25, tile_height=25, mines=()):
+    rows = len(board)
+    cols = len(board[0])
+    values = np.array(board)
+
+    glyph_w = max(1, tile_width // 3)
+    glyph_h = max(1, tile_height // 2)
+    gx = (tile_width - glyph_w) // 2
+    gy = (tile_height - glyph_h) // 2
+
+    # Backgrounds and digits are painted for all tiles at once, so large boards
+    # render quickly
+    shade = np.add.outer(np.arange(rows), np.arange(cols)) % 2
+    unopened = (values == 99) | (values == 0)
+    base = np.where(
+        unopened[..., None],
+        np.array(unopened_colors, dtype=np.uint8)[shade],
+        np.array(opened_colors, dtype=np.uint8)[shade],
+    )
+    frame = np.repeat(np.repeat(base, tile_height, axis=0), tile_width, axis=1)
+    tiles = frame.reshape(rows, tile_height, cols, tile_width, 3).transpose(
+        0, 2, 1, 3, 4
+    )
+    for val, color in number_colors.items():
+        r, c = np.nonzero(values == val)
+        tiles[r, c, gy : gy + glyph_h, gx : gx + glyph_w] = color
+
+    # Revealed mines, as shown after a loss
+    for i, (r, c) in enumerate(sorted(mines)):
+        if board[r][c] == 0:
+            continue
+        top = r * tile_height
+        left = c * tile_width
+        color = mine_colors[i % len(mine_colors)]
+        tile = frame[top : top + tile_height, left : left + tile_width]
+        tile[:] = color
+        tile[gy : gy + glyph_h, gx : gx + glyph_w] = [v * 2 // 3 for v in color]
+    return frame
+
+
+def expected_board(board):
+    return [
+        [val if val in (99, -1) or val in number_colors else -1 for val in row]
+        for row in board
+    ]
+
+
+def random_board(rows, cols, seed=None):
+    rng = random.Random(seed)
+    choices = [99, 99, 99, -1, -1, -1, 0, 1, 2, 3, 4, 5, 6]
+    return [[rng.choice(choices) for _ in range(cols)] for _ in range(rows)]
@@ -0,0 +1,207 @@
+import os
+
+import numpy as np
+
+from csp import count_solutions
+
+# Local 5x5 windows of the board, centred on a numbered tile, with what they
+# prove about their unopened tiles. Only the numbers in the inner 3x3 have all
+# their neighbours inside the window, so only their constraints are used; that
+# makes every deduction hold wherever the same window appears, on any board
+window = 5
+radius = window // 2
+record_dtype = np.dtype(
+    [("key", f"S{window * window}"), ("safe", "<u4"), ("mines", "<u4")]
+)
+
+# One character per tile: unopened, flagged, a number, or "." for anything
+# that is neither a mine nor a variable (blank, clicked by the bot, off the
+# board). Tiles that were not read yet make a window unusable
+tile_codes = {99: "u", 0: "f", -1: ".", -2: "."}
+tile_codes.update((n, str(n)) for n in range(1, 9))
+outside = "."
+
+
+def window_symmetries():
+    # For each rotation and reflection, the window position each canonical
+    # position is read from
+    cells = [(y, x) for y in range(window) for x in range(window)]
+    last = window - 1
+    transforms = [
+        lambda y, x: (y, x),
+        lambda y, x: (x, last - y),
+        lambda y, x: (last - y, last - x),
+        lambda y, x: (last - x, y),
+        lambda y, x: (y, last - x),
+        lambda y, x: (x, y),
+        lambda y, x: (last - y, x),
+        lambda y, x: (last - x, last - y),
+    ]
+    return [
+        [window * ty + tx for ty, tx in (transform(y, x) for y, x in cells)]
+        for transform in transforms
+    ]
+
+
+symmetries = window_symmetries()
+
+
+def solve_window(key):
+    # Exact count over the inner numbers' constraints, returned as bit masks
+    # over the window's positions
+    text = key.decode()
+    constraints = []
+    for y in range(1, window - 1):
+        for x in range(1, window - 1):
+            if not text[window * y + x].isdigit():
+                continue
+            tiles = []
+            mines = int(text[window * y + x])
+            for ny in range(y - 1, y + 2):
+                for nx in range(x - 1, x + 2):
+                    code = text[window * ny + nx]
+                    if code == "u":
+                        tiles.append((ny, nx))
+                    elif code == "f":
+                        mines -= 1
+            if tiles:
+                constraints.append((tuple(tiles), mines))
+
+    variables = sorted({tile for tiles, _ in constraints for tile in tiles})
+    if not variables:
+        return 0, 0
+    solution = count_solutions(variables, constraints)
+    safe = sum(1 << (window * y + x) for y, x in solution.safe)
+    mines = sum(1 << (window * y + x) for y, x in solution.mines)
+    return safe, mines
+
+
+class PatternBook:
+    def __init__(self, path=None):
+        self.path = path
+        self.table = np.zeros(0, dtype=record_dtype)
+        if path and os.path.exists(path):
+            self.table = np.load(path, mmap_mode="r")
+        self.learned = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.table) + len(self.learned)
+
+    def window_key(self, board, i):
+        # The window around tile i in canonical orientation, and the
+        # symmetry that produced it
+        values = board.values
+        row, col = board.coords[i]
+        codes = []
+        for r in range(row - radius, row + radius + 1):
+            for c in range(col - radius, col + radius + 1):
+                if 0 <= r < board.rows and 0 <= c < board.cols:
+                    code = tile_codes.get(values[r * board.cols + c])
+                    if code is None:
+                        return None, None
+                    # Numbers on the outer ring add no constraint, so windows
+                    # differing only there share an entry
+                    if code.isdigit() and not (
+                        abs(r - row) < radius and abs(c - col) < radius
+                    ):
+                        code = outside
+                    codes.append(code)
+                else:
+                    codes.append(outside)
+        return min(
+            ("".join(codes[p] for p in perm).encode(), perm) for perm in symmetries
+        )
+
+    def find(self, key):
+        found = self.learned.get(key)
+        if found is None and len(self.table):
+            keys = self.table["key"]
+            k = int(np.searchsorted(keys, key))
+            if k < len(keys) and keys[k] == key:
+                found = (int(self.table["safe"][k]), int(self.table["mines"][k]))
+        return found
+
+    def tiles(self, board, i, perm, mask):
+        # Canonical positions back to flat indices on the board
+        row, col = board.coords[i]
+        result = []
+        for position in range(window * window):
+            if mask >> position & 1:
+                y, x = divmod(perm[position], window)
+                result.append(board.index(row + y - radius, col + x - radius))
+        return result
+
+    def lookup(self, board, i):
+        key, perm = self.window_key(board, i)
+        if key is None:
+            return [], []
+        found = self.find(key)
+        if found is None:
+            self.misses += 1
+            return [], []
+        self.hits += 1
+        safe, mines = found
+        return self.tiles(board, i, perm, safe), self.tiles(board, i, perm, mines)
+
+    def learn(self, board, tiles):
+        # Windows around the numbers next to tiles the CSP stage resolved; the
+        # ones that prove something on their own are kept
+        learned = 0
+        centres = {
+            j
+            for tile in tiles
+            for j in board.neighbors[board.index(*tile)]
+            if j in board.frontier
+        }
+        for i in sorted(centres):
+            key, _ = self.window_key(board, i)
+            if key is None or self.find(key) is not None:
+                continue
+            safe, mines = solve_window(key)
+            if safe or mines:
+                self.learned[key] = (safe, mines)
+                learned += 1
+        return learned
+
+    def save(self):
+        if not self.path or not self.learned:
+            return
+        added = np.array(
+            [(key, safe, mines) for key, (safe, mines) in self.learned.items()],
+            dtype=record_dtype,
+        )
+        # Other sessions may have saved to the same file since it was loaded.
+        # The old table is copied into memory and every map of the file is
+        # dropped before the swap, since Windows won't replace a mapped file
+        if os.path.exists(self.path):
+            table = np.load(self.path)
+        else:
+            table = np.array(self.table)
+        self.table = table
+        merged = np.concatenate([table, added])
+        _, first = np.unique(merged["key"], return_index=True)
+        merged = merged[first]
+        # Written beside the old file and swapped in, so a reader never sees
+        # half a table
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            np.save(f, merged)
+        # If the swap fails, the in-memory table and the learned windows stay
+        # in use and the next save tries again
+        try:
+            os.replace(temp_path, self.path)
+        except OSError:
+            os.remove(temp_path)
+            raise
+        self.table = np.load(self.path, mmap_mode="r")
+        self.learned = {}
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return (
+            f"Pattern book: {self.hits} hits, {self.misses} misses "
+            f"({rate:.1f}% hit rate), {len(self)} windows"
+        )
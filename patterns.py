@@ -0,0 +1,59 @@
+import collections
+
+
+def compare(a, a_mines, b, b_mines):
+    only_a = a - b
+    only_b = b - a
+    if not only_a:
+        return [(only_b, b_mines - a_mines)]
+    if not only_b:
+        return [(only_a, a_mines - b_mines)]
+    # Overlapping pair: if A has as many extra mines as tiles of its own, all
+    # of those are mines and the shared tiles hold B's count, so the rest of B
+    # is safe (1-2-1 and 1-2-2-1 are this case)
+    if a_mines - b_mines == len(only_a):
+        return [(only_a, len(only_a)), (only_b, 0)]
+    if b_mines - a_mines == len(only_b):
+        return [(only_b, len(only_b)), (only_a, 0)]
+    return []
+
+
+def deduce(constraints, limit=4096):
+    # constraints are (tiles, mines) pairs. Every constraint is compared with
+    # each one it shares a tile with, and whatever the pair implies is fed back
+    # in until nothing new turns up
+    known = {}
+    index = collections.defaultdict(set)
+    safe = set()
+    mines = set()
+    work = collections.deque((frozenset(tiles), count) for tiles, count in constraints)
+
+    while work:
+        tiles, count = work.popleft()
+        count -= len(tiles & mines)
+        tiles = tiles - safe - mines
+        if not tiles or tiles in known or not 0 <= count <= len(tiles):
+            continue
+
+        if count == 0 or count == len(tiles):
+            (safe if count == 0 else mines).update(tiles)
+            # Constraints covering a solved tile shrink and go round again
+            for tile in tiles:
+                for other in index.pop(tile, ()):
+                    if other in known:
+                        work.append((other, known.pop(other)))
+            continue
+
+        if len(known) >= limit:
+            continue
+        known[tiles] = count
+        others = set()
+        for tile in tiles:
+            others.update(index[tile])
+            index[tile].add(tiles)
+
+        for other in others:
+            if other in known:
+                work.extend(compare(tiles, count, other, known[other]))
+
+    return safe, mines
@@ -0,0 +1,100 @@
+import concurrent.futures
+import threading
+import time
+
+from solver import collect_constraints, find_connected_components
+
+
+class MovePipeline:
+    def __init__(self, dispatcher, pool):
+        self.dispatcher = dispatcher
+        self.pool = pool
+        self.input = concurrent.futures.ThreadPoolExecutor(1, "input")
+        self.worker = concurrent.futures.ThreadPoolExecutor(1, "speculate")
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.sending = None
+        self.speculation = None
+        self.speculated = 0
+        self.cancelled = 0
+        self.overlap = 0.0
+
+    def send(self):
+        # Clicks go out on the input thread while the solver looks ahead
+        self.sending = self.input.submit(self.dispatcher.flush)
+        return self.sending
+
+    def wait_sent(self):
+        sent = self.sending.result() if self.sending else []
+        self.sending = None
+        return sent
+
+    def speculate(self, board, clicks):
+        # Components the CSP stage will need next time it runs, skipping any
+        # the in-flight clicks are about to change. Results land in the solver
+        # cache, so a component that is still the same next move is free
+        self.cancel()
+        near_clicks = set()
+        for r, c, _ in clicks:
+            i = board.index(r, c)
+            near_clicks.add(i)
+            near_clicks.update(board.neighbors[i])
+        touched = {
+            board.coords[j]
+            for j in board.unopened_near(board.pending["csp"])
+            if j not in near_clicks
+        }
+        if not touched:
+            return None
+
+        blocked = {board.coords[j] for j in near_clicks}
+        variables, constraints = collect_constraints(board)
+        components = [
+            (comp_vars, comp_consts)
+            for comp_vars, comp_consts in find_connected_components(
+                variables, constraints
+            )
+            if not touched.isdisjoint(comp_vars)
+            and blocked.isdisjoint(comp_vars)
+            and not self.pool.cache.contains(comp_vars, comp_consts)
+        ]
+        if not components:
+            return None
+
+        with self.lock:
+            generation = self.generation
+        self.speculation = self.worker.submit(self.solve_ahead, components, generation)
+        return self.speculation
+
+    def solve_ahead(self, components, generation):
+        start = time.perf_counter()
+        solved = 0
+        for comp_vars, comp_consts in sorted(components, key=lambda c: len(c[0])):
+            with self.lock:
+                if generation != self.generation:
+                    self.cancelled += len(components) - solved
+                    break
+            self.pool.submit(comp_vars, comp_consts).result()
+            solved += 1
+        with self.lock:
+            self.speculated += solved
+            self.overlap += time.perf_counter() - start
+        return solved
+
+    def cancel(self):
+        # A new frame makes anything still queued stale
+        with self.lock:
+            self.generation += 1
+        self.speculation = None
+
+    def shutdown(self):
+        self.cancel()
+        self.input.shutdown()
+        self.worker.shutdown()
+
+    def summary(self):
+        return (
+            f"Pipeline: {self.speculated} component(s) solved ahead of time, "
+            f"{self.cancelled} cancelled as stale, "
+            f"{self.overlap:.2f}s of solving overlapped with input and settling"
+        )
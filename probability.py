@@ -0,0 +1,70 @@
+from math import comb
+
+from csp import convolve
+
+
+def mine_probabilities(solutions, interior, mines_left=None):
+    # Every arrangement of the frontier is weighted by the number of ways the
+    # remaining mines can be spread over the unconstrained interior tiles.
+    # Without a mine count the interior can't be weighed, so only frontier
+    # tiles get a probability. None means the mine count fits no arrangement
+    interior = sorted(interior)
+    size = len(interior)
+    solutions = [solution for solution in solutions if solution.total]
+
+    prefix = [[1]]
+    for solution in solutions:
+        prefix.append(convolve(prefix[-1], solution.counts))
+    suffix = [[1]]
+    for solution in reversed(solutions):
+        suffix.append(convolve(suffix[-1], solution.counts))
+    suffix.reverse()
+
+    combined = prefix[-1]
+    weights = [1 if mines_left is None else 0] * len(combined)
+    if mines_left is not None:
+        # Each binomial follows from the one before it, which matters once the
+        # interior has thousands of tiles and every comb() is a huge number
+        current = None
+        for k in range(len(combined)):
+            left = mines_left - k
+            if left < 0 or left > size:
+                continue
+            if current is None:
+                current = comb(size, left)
+            else:
+                current = current * (left + 1) // (size - left)
+            weights[k] = current
+
+    def weight(frontier_mines):
+        return weights[frontier_mines]
+
+    total_weight = sum(count * weight(k) for k, count in enumerate(combined))
+    if not total_weight:
+        return {} if mines_left is None else None
+
+    probabilities = {}
+    for i, solution in enumerate(solutions):
+        others = convolve(prefix[i], suffix[i + 1])
+        # others_weight[k] is the weight of everything outside this component
+        # when it holds k mines
+        others_weight = [
+            sum(count * weight(k + t) for t, count in enumerate(others))
+            for k in range(len(solution.counts))
+        ]
+        for var in solution.variables:
+            mines = sum(
+                count * others_weight[k]
+                for k, count in enumerate(solution.mine_counts[var])
+            )
+            probabilities[var] = mines / total_weight
+
+    if interior and mines_left is not None:
+        expected = sum(
+            count * weight(k) * (mines_left - k) for k, count in enumerate(combined)
+        )
+        interior_probability = expected / total_weight / size
+        for tile in interior:
+            probabilities[tile] = interior_probability
+
+    return probabilities
@@ -0,0 +1,133 @@
+import collections
+import contextlib
+import json
+import time
+
+stage_order = (
+    "capture",
+    "end_state",
+    "recognition",
+    "process",
+    "patterns",
+    "book",
+    "csp",
+    "guess",
+    "dispatch",
+)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class NullProfiler:
+    def stage(self, name):
+        return contextlib.nullcontext()
+
+    def note(self, key, value):
+        pass
+
+    def add_component(self, variables, solution):
+        pass
+
+
+class MoveProfiler:
+    def __init__(self, trace_path=None, window=1000, cache=None):
+        self.trace = open(trace_path, "w") if trace_path else None
+        self.cache = cache
+        # Latencies are kept for the last window moves of each stage, and
+        # counted over all of them
+        self.window = window
+        self.samples = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self.counts = collections.Counter()
+        self.record = None
+        self.cache_snapshot = (0, 0)
+
+    def start_move(self, move_number):
+        self.record = {
+            "move": move_number,
+            "time": time.time(),
+            "stages": {},
+            "components": 0,
+            "component_variables": [],
+            "component_solutions": [],
+        }
+        if self.cache is not None:
+            self.cache_snapshot = (self.cache.hits, self.cache.misses)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if self.record is not None:
+                stages = self.record["stages"]
+                stages[name] = stages.get(name, 0.0) + elapsed
+
+    def note(self, key, value):
+        if self.record is not None:
+            self.record[key] = value
+
+    def add_component(self, variables, solution):
+        if self.record is not None:
+            self.record["components"] += 1
+            self.record["component_variables"].append(len(variables))
+            self.record["component_solutions"].append(solution.total)
+
+    def end_move(self):
+        record = self.record
+        if record is None:
+            return
+        self.record = None
+
+        if self.cache is not None:
+            hits, misses = self.cache_snapshot
+            record["cache_hits"] = self.cache.hits - hits
+            record["cache_misses"] = self.cache.misses - misses
+
+        total = sum(record["stages"].values())
+        for name, elapsed in record["stages"].items():
+            self.samples[name].append(elapsed)
+            self.counts[name] += 1
+        self.samples["total"].append(total)
+        self.counts["total"] += 1
+
+        if self.trace:
+            self.trace.write(json.dumps(record) + "\n")
+            self.trace.flush()
+
+    def summary(self):
+        names = [name for name in stage_order if name in self.samples]
+        names += sorted(set(self.samples) - set(stage_order) - {"total"})
+        if "total" in self.samples:
+            names.append("total")
+
+        lines = []
+        if any(count > self.window for count in self.counts.values()):
+            lines.append(f"Latencies over the last {self.window} moves of each stage")
+        lines.append(
+            f"{'stage':<12}{'moves':>7}{'mean ms':>10}{'p50 ms':>10}"
+            f"{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        )
+        for name in names:
+            values = self.samples[name]
+            lines.append(
+                f"{name:<12}{self.counts[name]:>7}"
+                f"{sum(values) / len(values) * 1000:>10.2f}"
+                f"{percentile(values, 0.5) * 1000:>10.2f}"
+                f"{percentile(values, 0.9) * 1000:>10.2f}"
+                f"{percentile(values, 0.99) * 1000:>10.2f}"
+                f"{max(values) * 1000:>10.2f}"
+            )
+        return "\n".join(lines)
+
+    def close(self):
+        if self.trace:
+            self.trace.close()
+            self.trace = None
+
+
+null_profiler = NullProfiler()
@@ -0,0 +1,447 @@
+import concurrent.futures
+
+import numpy as np
+from PIL import Image
+
+# Light and dark shades of the checkerboard; calibration, the end-state
+# check and the frame renderer all use these
+unopened_colors = [(159, 208, 78), (151, 202, 71)]
+opened_colors = [(229, 194, 159), (215, 184, 153)]
+
+color_map = {
+    (231, 45, 23): 0,  # Flag
+    (0, 108, 202): 1,  # 1
+    (74, 140, 70): 2,  # 2
+    (98, 145, 83): 2,  # 2
+    (210, 57, 56): 3,  # 3
+    (209, 42, 45): 3,  # 3
+    (113, 33, 150): 4,  # 4
+    (242, 159, 79): 5,  # 5
+    (220, 167, 118): 5,  # 5
+    (61, 156, 153): 6,  # 6
+    unopened_colors[0]: 99,  # Unopened tile
+    unopened_colors[1]: 99,  # Unopened tile
+}
+
+UNOPENED = 99
+OPENED = -1
+UNKNOWN = -3
+
+
+def extract_tile(board_image, row, col, tile_width, tile_height):
+    left = col * tile_width
+    top = row * tile_height
+    right = left + tile_width
+    bottom = top + tile_height
+
+    tile_image = board_image.crop((left, top, right, bottom))
+    return tile_image
+
+
+def scan_area(tile_width, tile_height, scan_box=25):
+    # The scan box sits in the middle of the tile and shrinks with the tile
+    # pitch on boards drawn smaller than the 25-pixel expert tiles
+    box_width = min(scan_box, tile_width)
+    box_height = min(scan_box, tile_height)
+    offset_x = (tile_width - box_width) // 2
+    offset_y = (tile_height - box_height) // 2
+    return offset_x, offset_y, box_width, box_height
+
+
+def detect_tile_number(tile_img, color_map, scan_box=25):
+    tile_img = tile_img.convert("RGB")
+    offset_x, offset_y, box_width, box_height = scan_area(*tile_img.size, scan_box)
+
+    plain_count = 0
+
+    for x in range(offset_x, offset_x + box_width):
+        for y in range(offset_y, offset_y + box_height):
+            pixel = tile_img.getpixel((x, y))
+            if pixel in color_map:
+                if color_map[pixel] != 99:
+                    return color_map[pixel]
+                else:
+                    plain_count += 1
+
+    if plain_count == box_width * box_height:
+        return 99
+
+    return -1  # Opened tile
+
+
+def process_tile(args):
+    (
+        row,
+        col,
+        screenshot,
+        tile_width,
+        tile_height,
+        prev_hash,
+        cached_value,
+        color_map,
+    ) = args
+    tile_img = extract_tile(screenshot, row, col, tile_width, tile_height)
+    tile_data = tile_img.tobytes()
+
+    if prev_hash == tile_data:
+        return row, col, cached_value, tile_data
+
+    value = detect_tile_number(tile_img, color_map)
+    return row, col, value, tile_data
+
+
+def get_board_from_screenshot(
+    screenshot,
+    prev_hashes,
+    cached_board,
+    rows,
+    cols,
+    tile_width,
+    tile_height,
+    colors,
+    serial=False,
+):
+    current_board = [[None] * cols for _ in range(rows)]
+    tasks = [
+        (
+            row,
+            col,
+            screenshot,
+            tile_width,
+            tile_height,
+            prev_hashes[row][col],
+            cached_board[row][col],
+            colors,
+        )
+        for row in range(rows)
+        for col in range(cols)
+    ]
+
+    if serial:
+        results = map(process_tile, tasks)
+    else:
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            futures = [executor.submit(process_tile, args) for args in tasks]
+            results = [
+                future.result() for future in concurrent.futures.as_completed(futures)
+            ]
+
+    for row, col, value, new_hash in results:
+        current_board[row][col] = value
+        prev_hashes[row][col] = new_hash
+        cached_board[row][col] = value
+
+    return current_board
+
+
+class TileScanRecognizer:
+    serial = False
+
+    def __init__(self, rows, cols, tile_width, tile_height, colors=color_map):
+        self.rows = rows
+        self.cols = cols
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.colors = colors
+        self.reset()
+
+    def reset(self):
+        self.prev_hashes = [[None] * self.cols for _ in range(self.rows)]
+        self.cached_board = [[None] * self.cols for _ in range(self.rows)]
+        self.changed = None
+
+    def read(self, screenshot):
+        if isinstance(screenshot, np.ndarray):
+            screenshot = Image.fromarray(screenshot)
+        old_hashes = [row[:] for row in self.prev_hashes]
+        board = get_board_from_screenshot(
+            screenshot,
+            self.prev_hashes,
+            self.cached_board,
+            self.rows,
+            self.cols,
+            self.tile_width,
+            self.tile_height,
+            self.colors,
+            self.serial,
+        )
+        self.changed = {
+            (r, c)
+            for r in range(self.rows)
+            for c in range(self.cols)
+            if old_hashes[r][c] != self.prev_hashes[r][c]
+        }
+        return board
+
+    def read_tiles(self, screenshot, tiles):
+        if isinstance(screenshot, np.ndarray):
+            screenshot = Image.fromarray(screenshot)
+        return {
+            (r, c): detect_tile_number(
+                extract_tile(screenshot, r, c, self.tile_width, self.tile_height),
+                self.colors,
+            )
+            for r, c in tiles
+        }
+
+
+class SerialScanRecognizer(TileScanRecognizer):
+    # The same per-pixel scan on the calling thread, without the pool
+    serial = True
+
+
+def pack_rgb(pixels):
+    pixels = pixels.astype(np.uint32)
+    return (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+
+
+def build_color_lut(colors):
+    packed = sorted(
+        ((r << 16) | (g << 8) | b, value) for (r, g, b), value in colors.items()
+    )
+    keys = np.array([key for key, _ in packed], dtype=np.uint32)
+    values = np.array([value for _, value in packed], dtype=np.int16)
+    return keys, values
+
+
+def to_pixel_array(screenshot):
+    if isinstance(screenshot, np.ndarray):
+        pixels = screenshot
+    else:
+        pixels = np.asarray(screenshot.convert("RGB"))
+    return pixels[..., :3]
+
+
+class VectorizedRecognizer:
+    def __init__(
+        self,
+        rows,
+        cols,
+        tile_width,
+        tile_height,
+        colors=color_map,
+        scan_box=25,
+        strip_tiles=1024,
+    ):
+        self.rows = rows
+        self.cols = cols
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.keys, self.values = build_color_lut(colors)
+        self.offset_x, self.offset_y, self.box_width, self.box_height = scan_area(
+            tile_width, tile_height, scan_box
+        )
+        # Large boards are read a band of tile rows at a time, so the
+        # temporary arrays stay the same size however big the board is
+        self.strip_rows = max(1, strip_tiles // cols)
+        self.reset()
+
+    def reset(self):
+        self.prev_box = None
+        self.board = np.full((self.rows, self.cols), OPENED, dtype=np.int16)
+        self.changed = None
+
+    def tile_view(self, pixels, top=0, bottom=None):
+        bottom = self.rows if bottom is None else min(bottom, self.rows)
+        cols = self.cols
+        th, tw = self.tile_height, self.tile_width
+        grid = pixels[top * th : bottom * th, : cols * tw]
+        return grid.reshape(bottom - top, th, cols, tw, 3).transpose(0, 2, 1, 3, 4)
+
+    def crop(self, tiles):
+        box = tiles[
+            ...,
+            self.offset_y : self.offset_y + self.box_height,
+            self.offset_x : self.offset_x + self.box_width,
+            :,
+        ]
+        # detect_tile_number scans column by column, so the first number colour
+        # found must be taken in (x, y) order to pick the same pixel
+        return box.swapaxes(-3, -2).reshape(tiles.shape[:-3] + (-1, 3))
+
+    def scan_box(self, pixels, top=0, bottom=None):
+        return self.crop(self.tile_view(pixels, top, bottom))
+
+    def classify(self, box):
+        packed = pack_rgb(box)
+
+        index = np.minimum(np.searchsorted(self.keys, packed), len(self.keys) - 1)
+        hit = self.keys[index] == packed
+        values = np.where(hit, self.values[index], OPENED)
+
+        is_number = hit & (values != UNOPENED)
+        first = is_number.argmax(axis=-1)[..., None]
+        number = np.take_along_axis(values, first, axis=-1)[..., 0]
+        plain = (values == UNOPENED).all(axis=-1)
+
+        return np.where(
+            is_number.any(axis=-1), number, np.where(plain, UNOPENED, OPENED)
+        )
+
+    def read(self, screenshot):
+        pixels = to_pixel_array(screenshot)
+        dirty = np.ones((self.rows, self.cols), dtype=bool)
+        first = self.prev_box is None
+
+        for top in range(0, self.rows, self.strip_rows):
+            rows = slice(top, top + self.strip_rows)
+            box = self.scan_box(pixels, top, top + self.strip_rows)
+            if self.prev_box is None:
+                self.prev_box = np.empty(
+                    (self.rows, self.cols) + box.shape[2:], dtype=box.dtype
+                )
+            if not first:
+                dirty[rows] = (box != self.prev_box[rows]).any(axis=(2, 3))
+            self.prev_box[rows] = box
+
+            # Only tiles whose pixels changed since the last frame are classified
+            self.update_tiles(box, dirty[rows], rows)
+
+        self.changed = set(zip(*map(np.ndarray.tolist, np.nonzero(dirty))))
+        return self.board.tolist()
+
+    def update_tiles(self, box, dirty, rows=slice(None)):
+        self.board[rows][dirty] = self.classify(box[dirty])
+
+    def read_tiles(self, screenshot, tiles):
+        tiles = sorted(tiles)
+        rows = [r for r, _ in tiles]
+        cols = [c for _, c in tiles]
+        box = self.crop(self.tile_view(to_pixel_array(screenshot))[rows, cols])
+        return dict(zip(tiles, self.classify(box).tolist()))
+
+
+def build_quantized_lut(colors, bits=5, tolerance=40):
+    # Every quantized colour maps to the nearest palette entry, or to UNKNOWN
+    # if nothing is within tolerance of the centre of its cell
+    step = 1 << (8 - bits)
+    centres = np.arange(1 << bits) * step + step // 2
+    cells = np.stack(np.meshgrid(centres, centres, centres, indexing="ij"), axis=-1)
+    cells = cells.reshape(-1, 1, 3)
+
+    palette = np.array(list(colors), dtype=np.int32)
+    distances = ((cells - palette) ** 2).sum(axis=-1)
+    nearest = distances.argmin(axis=-1)
+    close = distances[np.arange(len(nearest)), nearest] <= tolerance**2
+
+    labels = sorted(set(colors.values())) + [UNKNOWN]
+    label_index = np.array(
+        [labels.index(value) for value in colors.values()], dtype=np.uint8
+    )
+    lut = np.where(close, label_index[nearest], len(labels) - 1).astype(np.uint8)
+    return lut, labels
+
+
+class TolerantRecognizer(VectorizedRecognizer):
+    def __init__(
+        self,
+        rows,
+        cols,
+        tile_width,
+        tile_height,
+        colors=color_map,
+        scan_box=25,
+        step=None,
+        bits=5,
+        tolerance=40,
+        min_pixels=None,
+        plain_fraction=0.9,
+    ):
+        super().__init__(rows, cols, tile_width, tile_height, colors, scan_box)
+        # Small tiles need every pixel, or digits only a couple of pixels
+        # wide fall between the samples; the digit threshold keeps the same
+        # share of the sample as 3 of the 13x13 samples on 25-pixel tiles
+        if step is None:
+            step = 1 if min(self.box_width, self.box_height) < 16 else 2
+        self.step = step
+        samples = -(-self.box_width // step) * -(-self.box_height // step)
+        if min_pixels is None:
+            min_pixels = max(1, round(samples * 3 / 169))
+        self.bits = bits
+        self.min_pixels = min_pixels
+        self.plain_fraction = plain_fraction
+        palette = dict(colors)
+        palette.update((color, OPENED) for color in opened_colors)
+        self.lut, labels = build_quantized_lut(palette, bits, tolerance)
+        self.labels = np.array(labels, dtype=np.int16)
+        self.unopened_label = labels.index(UNOPENED)
+        self.opened_label = labels.index(OPENED)
+        self.number_labels = np.array(
+            [
+                i
+                for i, value in enumerate(labels)
+                if value not in (UNOPENED, OPENED, UNKNOWN)
+            ],
+            dtype=np.intp,
+        )
+
+    def reset(self):
+        super().reset()
+        self.confidence = np.zeros((self.rows, self.cols), dtype=np.float32)
+
+    def crop(self, tiles):
+        box = tiles[
+            ...,
+            self.offset_y : self.offset_y + self.box_height : self.step,
+            self.offset_x : self.offset_x + self.box_width : self.step,
+            :,
+        ]
+        return box.reshape(tiles.shape[:-3] + (-1, 3))
+
+    def histogram(self, box):
+        shift = 8 - self.bits
+        quantized = (box >> shift).astype(np.intp)
+        keys = (quantized[..., 0] << (2 * self.bits)) | (quantized[..., 1] << self.bits)
+        keys |= quantized[..., 2]
+        labels = self.lut[keys]
+        return (labels[..., None] == np.arange(len(self.labels))).sum(axis=-2)
+
+    def score(self, box):
+        counts = self.histogram(box)
+        total = counts.sum(axis=-1)
+        plain = counts[..., self.unopened_label]
+        opened = counts[..., self.opened_label]
+
+        numbers = counts[..., self.number_labels]
+        if len(self.number_labels):
+            best = numbers.argmax(axis=-1)
+            best_count = np.take_along_axis(numbers, best[..., None], axis=-1)[..., 0]
+            number = self.labels[self.number_labels[best]]
+        else:
+            best_count = np.zeros_like(total)
+            number = np.full(total.shape, UNKNOWN, dtype=np.int16)
+
+        values = np.where(
+            best_count >= self.min_pixels,
+            number,
+            np.where(plain >= self.plain_fraction * total, UNOPENED, OPENED),
+        )
+        # Share of the sample explained by the chosen value: the digit plus the
+        # background it sits on (flags sit on unopened tiles)
+        background = np.where((values == UNOPENED) | (values == 0), plain, opened)
+        digit = np.where((values == UNOPENED) | (values == OPENED), 0, best_count)
+        return values, (background + digit) / np.maximum(total, 1)
+
+    def classify(self, box):
+        return self.score(box)[0]
+
+    def update_tiles(self, box, dirty, rows=slice(None)):
+        values, confidence = self.score(box[dirty])
+        self.board[rows][dirty] = values
+        self.confidence[rows][dirty] = confidence
+
+    def uncertain(self, threshold=0.8):
+        rows, cols = np.nonzero(self.confidence < threshold)
+        return list(zip(rows.tolist(), cols.tolist()))
+
+
+recognizers = {
+    "tolerant": TolerantRecognizer,
+    "vectorized": VectorizedRecognizer,
+    "threaded": TileScanRecognizer,
+    "serial": SerialScanRecognizer,
+}
+
+
+def make_recognizer(name, rows, cols, tile_width, tile_height, colors=color_map):
+    return recognizers[name](rows, cols, tile_width, tile_height, colors)
@@ -0,0 +1,131 @@
+import json
+import os
+
+import numpy as np
+
+from recognition import color_map
+
+
+def tile_stack(frame, rows, cols, tile_width, tile_height):
+    grid = frame[: rows * tile_height, : cols * tile_width, :3]
+    tiles = grid.reshape(rows, tile_height, cols, tile_width, 3).transpose(
+        0, 2, 1, 3, 4
+    )
+    return tiles.reshape(rows * cols, tile_height, tile_width, 3)
+
+
+class FrameRecorder:
+    # Frames are delta-encoded by tile: each frame appends only the tiles that
+    # changed since the previous one, and frames.jsonl says which tiles those
+    # were and what the bot did with the frame. close() turns the appended
+    # tiles into tiles.npy so replays can memory-map them. meta.json keeps
+    # the palette and solver options too, so a replay reads and decides
+    # like the recorded session did
+    def __init__(
+        self,
+        path,
+        rows,
+        cols,
+        tile_width,
+        tile_height,
+        mines=None,
+        palette=color_map,
+        options=None,
+    ):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.rows = rows
+        self.cols = cols
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.previous = None
+        self.tile_count = 0
+        self.frame_count = 0
+        self.raw = open(os.path.join(path, "tiles.raw"), "wb")
+        self.log = open(os.path.join(path, "frames.jsonl"), "w")
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(
+                {
+                    "rows": rows,
+                    "cols": cols,
+                    "tile_width": tile_width,
+                    "tile_height": tile_height,
+                    "mines": mines,
+                    "palette": [[*color, value] for color, value in palette.items()],
+                    "options": options or {},
+                },
+                f,
+            )
+
+    def record(self, frame, moves=(), outcome=None):
+        tiles = tile_stack(
+            frame, self.rows, self.cols, self.tile_width, self.tile_height
+        )
+        if self.previous is None:
+            changed = np.arange(len(tiles))
+        else:
+            changed = np.flatnonzero((tiles != self.previous).any(axis=(1, 2, 3)))
+        self.raw.write(np.ascontiguousarray(tiles[changed]).tobytes())
+        self.previous = tiles.copy()
+
+        entry = {
+            "frame": self.frame_count,
+            "first_tile": self.tile_count,
+            "tiles": changed.tolist(),
+            "moves": [list(move) for move in moves],
+        }
+        if outcome:
+            entry["outcome"] = outcome
+        self.log.write(json.dumps(entry) + "\n")
+        self.tile_count += len(changed)
+        self.frame_count += 1
+
+    def close(self):
+        if self.raw is None:
+            return
+        self.raw.close()
+        self.log.close()
+        self.raw = None
+
+        raw_path = os.path.join(self.path, "tiles.raw")
+        shape = (self.tile_count, self.tile_height, self.tile_width, 3)
+        tiles = np.lib.format.open_memmap(
+            os.path.join(self.path, "tiles.npy"), mode="w+", dtype=np.uint8, shape=shape
+        )
+        if self.tile_count:
+            tiles[:] = np.memmap(raw_path, dtype=np.uint8, mode="r", shape=shape)
+        tiles.flush()
+        del tiles
+        os.remove(raw_path)
+        print(
+            f"Recorded {self.frame_count} frames ({self.tile_count} tiles) to {self.path}"
+        )
+
+
+def load_recording(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    # Recordings made before the palette was stored used the default one
+    if "palette" in meta:
+        meta["palette"] = {(r, g, b): value for r, g, b, value in meta["palette"]}
+    else:
+        meta["palette"] = color_map
+    meta.setdefault("options", {})
+    with open(os.path.join(path, "frames.jsonl")) as f:
+        entries = [json.loads(line) for line in f]
+    tiles = np.load(os.path.join(path, "tiles.npy"), mmap_mode="r")
+    return meta, entries, tiles
+
+
+def replay_frames(meta, entries, tiles):
+    # Frames are rebuilt in place, like a capture backend's reused buffer
+    rows, cols = meta["rows"], meta["cols"]
+    tw, th = meta["tile_width"], meta["tile_height"]
+    frame = np.zeros((rows * th, cols * tw, 3), dtype=np.uint8)
+    view = frame.reshape(rows, th, cols, tw, 3).transpose(0, 2, 1, 3, 4)
+
+    for entry in entries:
+        first = entry["first_tile"]
+        for k, i in enumerate(entry["tiles"]):
+            view[i // cols, i % cols] = tiles[first + k]
+        yield entry, frame
@@ -0,0 +1,139 @@
+import argparse
+import contextlib
+import os
+import random
+import time
+
+from board import Board
+from dispatch import DryRunSink, InputDispatcher
+from endstate import EndStateDetector
+from pattern_book import PatternBook
+from profiler import MoveProfiler
+from recognition import make_recognizer, recognizers
+from recording import load_recording, replay_frames
+from solver import csp_modes, play_move
+from solver_pool import SolverPool
+
+
+def replay(
+    path,
+    recognizer_name="tolerant",
+    profiler=None,
+    pool=None,
+    seed=0,
+    csp_mode=None,
+    book_path=None,
+):
+    # Feed a recording through the same end-state check, recognition and
+    # solvers as the live loop, and compare the moves decided on each frame
+    # with the ones that were recorded. The palette and solver options come
+    # from the recording unless csp_mode or book_path override them
+    meta, entries, tiles = load_recording(path)
+    rows, cols = meta["rows"], meta["cols"]
+    tile_width, tile_height = meta["tile_width"], meta["tile_height"]
+    mines = meta["mines"]
+    options = meta["options"]
+    csp_mode = csp_mode or options.get("csp", "full")
+    book_path = book_path or options.get("book")
+    # The book is only read here, never saved back
+    book = PatternBook(book_path) if book_path else None
+
+    random.seed(seed)
+    pool = pool or SolverPool("threads")
+    profiler = profiler or MoveProfiler(cache=pool.cache)
+    recognizer = make_recognizer(
+        recognizer_name, rows, cols, tile_width, tile_height, meta["palette"]
+    )
+    detector = EndStateDetector(rows, cols, tile_width, tile_height, mines)
+    board_state = Board(rows, cols)
+    tile_grid = [[(col, row) for col in range(cols)] for row in range(rows)]
+    dispatcher = InputDispatcher(tile_grid, DryRunSink(), order="queue")
+
+    mismatches = []
+    for entry, frame in replay_frames(meta, entries, tiles):
+        profiler.start_move(entry["frame"])
+        with profiler.stage("end_state"):
+            outcome = detector.check(frame)
+        if not outcome:
+            with profiler.stage("recognition"):
+                board_state.update(recognizer.read(frame), recognizer.changed)
+            if detector.solved(board_state):
+                outcome = "won"
+        if not outcome and not play_move(
+            board_state, dispatcher, mines, pool, profiler, csp_mode, book
+        ):
+            outcome = "stuck" if board_state.unopened else "won"
+
+        decided = []
+        if not outcome:
+            with profiler.stage("dispatch"):
+                decided = dispatcher.flush()
+        profiler.end_move()
+
+        recorded = {tuple(move) for move in entry["moves"]}
+        if set(decided) != recorded or outcome != entry.get("outcome"):
+            mismatches.append(
+                (
+                    entry["frame"],
+                    entry.get("outcome") or f"{len(recorded)} moves",
+                    outcome or f"{len(decided)} moves",
+                )
+            )
+
+        # A recorded game can be followed by another after a restart
+        if entry.get("outcome"):
+            board_state.reset()
+            recognizer.reset()
+            detector.reset()
+
+    return len(entries), mismatches
+
+
+parser = argparse.ArgumentParser(
+    description="Replay a recorded session through recognition and the solvers"
+)
+parser.add_argument("recording", help="Directory written by main.py --record")
+parser.add_argument("--recognizer", choices=sorted(recognizers), default="tolerant")
+parser.add_argument("--seed", type=int, default=0, help="Seed for random guesses")
+parser.add_argument("--verbose", action="store_true", help="Show the solver output")
+parser.add_argument("--trace", help="Write a JSON line per replayed frame")
+parser.add_argument(
+    "--csp", choices=csp_modes, help="CSP mode (default: the recorded one)"
+)
+parser.add_argument("--book", help="Pattern book file (default: the recorded one)")
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    pool = SolverPool("threads")
+    profiler = MoveProfiler(args.trace, cache=pool.cache)
+
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull:
+        output = (
+            contextlib.nullcontext()
+            if args.verbose
+            else contextlib.redirect_stdout(devnull)
+        )
+        with output:
+            frames, mismatches = replay(
+                args.recording,
+                args.recognizer,
+                profiler,
+                pool,
+                args.seed,
+                args.csp,
+                args.book,
+            )
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+
+    print(
+        f"Replayed {frames} frames in {elapsed:.2f}s "
+        f"({frames / max(elapsed, 1e-9):.0f} frames/s), "
+        f"{len(mismatches)} decided differently from the recording"
+    )
+    for frame, recorded, replayed in mismatches[:20]:
+        print(f"  frame {frame}: recorded {recorded}, replayed {replayed}")
+    print(profiler.summary())
+    profiler.close()
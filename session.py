@@ -0,0 +1,376 @@
+import contextlib
+import random
+import time
+
+from PIL import Image
+
+from board import Board
+from calibration import standard_layouts
+from capture import make_capture
+from dispatch import DryRunSink, InputDispatcher, PyAutoGuiSink
+from endstate import EndStateDetector
+from pattern_book import PatternBook
+from pipeline import MovePipeline
+from profiler import MoveProfiler
+from recording import FrameRecorder
+from recognition import color_map, make_recognizer
+from settle import SettleDetector
+from solver import play_move
+from solver_pool import SolverPool
+
+default_geometry = {
+    "left": 2580,
+    "top": 364,
+    "right": 3180,
+    "bottom": 864,
+    "rows": 20,
+    "cols": 24,
+    "palette": color_map,
+}
+
+# Where the play-again button sits on the end-of-game overlay, as a fraction of
+# the board size; calibration profiles can override it with a "restart" entry
+restart_button = (0.5, 0.75)
+
+
+def print_board(board):
+    for row in board:
+        print(" ".join(f"{val:2}" for val in row).replace("0", "F"))
+    print()
+
+
+class BotSession:
+    def __init__(
+        self, args, geometry=default_geometry, name="minesweeper", input_lock=None
+    ):
+        self.args = args
+        self.name = name
+        # Sessions in other processes share the mouse, so their clicks are
+        # sent one batch at a time
+        self.input_lock = input_lock or contextlib.nullcontext()
+        self.hover_time = 0.1
+        self.restart_button = geometry.get("restart", restart_button)
+
+        self.left = geometry["left"]
+        self.top = geometry["top"]
+        self.rows = geometry["rows"]
+        self.cols = geometry["cols"]
+        self.width = geometry["right"] - self.left
+        self.height = geometry["bottom"] - self.top
+        self.tile_width = self.width // self.cols
+        self.tile_height = self.height // self.rows
+        if args.mines is not None:
+            self.mines = args.mines
+        else:
+            self.mines = standard_layouts.get((self.rows, self.cols))
+
+        self.running = True
+        self.outcome = None
+        self.moves = -2
+        self.move_number = 1
+        self.recent_clicks = []
+        self.elapsed = 0.0
+        self.cpu = 0.0
+        self.games = []
+        self.game_start = (time.perf_counter(), 0)
+
+        self.tile_grid = self.generate_tile_coords()
+        self.recognizer = make_recognizer(
+            args.recognizer,
+            self.rows,
+            self.cols,
+            self.tile_width,
+            self.tile_height,
+            geometry["palette"],
+        )
+        self.board = Board(self.rows, self.cols)
+        self.end_detector = EndStateDetector(
+            self.rows, self.cols, self.tile_width, self.tile_height, self.mines
+        )
+        self.recorder = None
+        if args.record:
+            self.recorder = FrameRecorder(
+                args.record,
+                self.rows,
+                self.cols,
+                self.tile_width,
+                self.tile_height,
+                self.mines,
+                geometry["palette"],
+                {"csp": args.csp, "book": args.book},
+            )
+        self.grabber = make_capture(
+            args.capture, (self.left, self.top, self.width, self.height)
+        )
+        self.settler = SettleDetector(
+            self.grabber,
+            self.recognizer,
+            self.board,
+            mode=args.settle,
+            timeout=args.settle_timeout,
+        )
+        self.sink = DryRunSink() if args.dry_run else PyAutoGuiSink()
+        self.dispatcher = InputDispatcher(
+            self.tile_grid, self.sink, order=args.click_order
+        )
+        self.solver_pool = SolverPool(
+            args.executor,
+            inline_threshold=args.inline_threshold,
+            cache_size=args.cache_size,
+        )
+        self.profiler = MoveProfiler(args.trace, cache=self.solver_pool.cache)
+        self.book = PatternBook(args.book) if args.book else None
+        self.pipeline = (
+            MovePipeline(self.dispatcher, self.solver_pool) if args.pipeline else None
+        )
+
+    def generate_tile_coords(self):
+        grid = []
+        for row in range(self.rows):
+            row_coords = []
+            for col in range(self.cols):
+                x = self.left + col * self.tile_width + self.tile_width // 2
+                y = self.top + row * self.tile_height + self.tile_height // 2
+                row_coords.append((x, y))
+            grid.append(row_coords)
+        return grid
+
+    def hover_tiles(self):
+        import pyautogui
+
+        for row in self.tile_grid:
+            for x, y in row:
+                if not self.running:
+                    print("Stopped by user.")
+                    return
+                pyautogui.moveTo(x, y, duration=0.05)
+                time.sleep(self.hover_time)
+
+    def stop(self):
+        self.running = False
+        self.outcome = self.outcome or "stopped"
+
+    def capture_screenshot(self, capture_number=1):
+        screenshot = self.settler.wait(self.recent_clicks)
+        self.recent_clicks.clear()
+        if self.args.debug:
+            Image.fromarray(screenshot).save(
+                f"{self.name}_capture_{capture_number}.png"
+            )
+        return screenshot
+
+    def left_click_tile(self, row, col):
+        x, y = self.tile_grid[row][col]
+        self.moves += 1
+        self.recent_clicks.append((row, col, "left"))
+        with self.input_lock:
+            self.sink.click(x, y, "left")
+
+    def click_random_center_tile(self, center_radius=3):
+        center_row = self.rows // 2
+        center_col = self.cols // 2
+
+        row = random.randint(
+            max(0, center_row - center_radius),
+            min(self.rows - 1, center_row + center_radius),
+        )
+        col = random.randint(
+            max(0, center_col - center_radius),
+            min(self.cols - 1, center_col + center_radius),
+        )
+
+        self.left_click_tile(row, col)
+        self.left_click_tile(row, col)
+
+    def send_queued_moves(self):
+        with self.input_lock:
+            if self.pipeline:
+                clicks = list(self.dispatcher.pending)
+                self.pipeline.send()
+                self.pipeline.speculate(self.board, clicks)
+                sent = self.pipeline.wait_sent()
+            else:
+                sent = self.dispatcher.flush()
+        self.moves += len(sent)
+        self.recent_clicks.extend(sent)
+        return sent
+
+    def step(self):
+        args = self.args
+        profiler = self.profiler
+        recognizer = self.recognizer
+        board_state = self.board
+
+        print(f"\n--- Move {self.move_number} ---")
+        profiler.start_move(self.move_number)
+
+        with profiler.stage("capture"):
+            screenshot = self.capture_screenshot(self.move_number)
+
+        with profiler.stage("end_state"):
+            end_state = self.end_detector.check(screenshot)
+        if end_state:
+            return self.end_game(screenshot, end_state)
+
+        with profiler.stage("recognition"):
+            board_state.update(recognizer.read(screenshot), recognizer.changed)
+        if self.end_detector.solved(board_state):
+            return self.end_game(screenshot, "won")
+        if args.debug and hasattr(recognizer, "uncertain"):
+            uncertain = recognizer.uncertain()
+            if uncertain:
+                print(f"Low-confidence tiles: {uncertain}")
+        if self.pipeline and board_state.changed:
+            self.pipeline.cancel()
+        print_board(board_state)
+
+        if not play_move(
+            board_state,
+            self.dispatcher,
+            self.mines,
+            self.solver_pool,
+            profiler,
+            args.csp,
+            self.book,
+        ):
+            return self.end_game(screenshot, "stuck" if board_state.unopened else "won")
+
+        with profiler.stage("dispatch"):
+            sent = self.send_queued_moves()
+        profiler.note("clicks", len(sent))
+        profiler.end_move()
+        self.record(screenshot, sent)
+        self.move_number += 1
+        return True
+
+    def record(self, frame, moves=(), outcome=None):
+        if self.recorder:
+            self.recorder.record(frame, moves, outcome)
+
+    def end_game(self, frame, outcome):
+        # The outcome goes into the move's trace line before it is written
+        self.profiler.note("game_over", outcome)
+        self.profiler.end_move()
+        self.record(frame, outcome=outcome)
+        return self.finish_game(outcome)
+
+    def finish_game(self, outcome):
+        started, moves = self.game_start
+        game = {
+            "outcome": outcome,
+            "moves": self.moves - moves,
+            "elapsed": time.perf_counter() - started,
+        }
+        self.games.append(game)
+        print(
+            f"Game {len(self.games)} {outcome} after {game['moves']} moves "
+            f"in {game['elapsed']:.1f}s."
+        )
+
+        if (
+            self.args.restart
+            and self.args.new_game
+            and not self.args.dry_run
+            and outcome != "stuck"
+            and self.restart()
+        ):
+            return True
+        self.outcome = outcome
+        return False
+
+    def restart(self, timeout=5.0, interval=0.2, retry=1.0):
+        x = self.left + int(self.width * self.restart_button[0])
+        y = self.top + int(self.height * self.restart_button[1])
+
+        # A win read from the board comes before the overlay is drawn, and a
+        # loss reveals its mines first, so the button only exists once the
+        # overlay is up
+        deadline = time.perf_counter() + timeout
+        while not self.end_detector.overlay(self.grabber.grab()):
+            if not self.running:
+                return False
+            if time.perf_counter() > deadline:
+                print("The end-of-game overlay did not appear.")
+                return False
+            time.sleep(interval)
+
+        # Click play again, and again if a click is missed, until the overlay
+        # clears and a fresh board shows
+        deadline = time.perf_counter() + timeout
+        clicked = None
+        while True:
+            if not self.running:
+                return False
+            now = time.perf_counter()
+            if now > deadline:
+                print("The board did not reset after clicking play again.")
+                return False
+            if clicked is None or now - clicked >= retry:
+                with self.input_lock:
+                    self.sink.click(x, y, "left")
+                clicked = now
+            time.sleep(interval)
+            frame = self.grabber.grab()
+            self.end_detector.reset()
+            if self.end_detector.check(frame) is None:
+                break
+
+        self.board.reset()
+        self.recognizer.reset()
+        self.recent_clicks.clear()
+        if self.pipeline:
+            self.pipeline.cancel()
+        self.game_start = (time.perf_counter(), self.moves)
+        print("Starting a new game...")
+        self.click_random_center_tile()
+        time.sleep(0.5)
+        return True
+
+    def run(self):
+        start = time.perf_counter()
+        cpu = time.process_time()
+        self.game_start = (start, self.moves)
+
+        if self.args.new_game and not self.args.dry_run:
+            self.click_random_center_tile()
+
+        time.sleep(0.5)
+
+        while self.running and self.step():
+            pass
+
+        self.elapsed += time.perf_counter() - start
+        self.cpu += time.process_time() - cpu
+        return self.result()
+
+    def result(self):
+        return {
+            "name": self.name,
+            "outcome": self.outcome,
+            "games": len(self.games),
+            "won": sum(game["outcome"] == "won" for game in self.games),
+            "moves": self.moves,
+            "elapsed": self.elapsed,
+            "cpu": self.cpu,
+        }
+
+    def close(self):
+        self.grabber.close()
+        if self.recorder:
+            self.recorder.close()
+        if self.pipeline:
+            self.pipeline.shutdown()
+            print(self.pipeline.summary())
+        self.solver_pool.shutdown()
+        if self.games:
+            won = sum(game["outcome"] == "won" for game in self.games)
+            print(f"Games: {len(self.games)} played, {won} won")
+        print(self.solver_pool.cache.summary())
+        if self.book:
+            self.book.save()
+            print(self.book.summary())
+        print(self.settler.summary())
+        print(self.dispatcher.summary())
+        print(self.profiler.summary())
+        self.profiler.close()
+        print(f"\nTotal Moves made: {self.moves}")
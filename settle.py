@@ -0,0 +1,99 @@
+import time
+
+import numpy as np
+
+from profiler import percentile
+
+settle_modes = ("fixed", "adaptive")
+
+
+class SettleDetector:
+    def __init__(
+        self,
+        grabber,
+        recognizer,
+        board,
+        mode="fixed",
+        delay=0.8,
+        timeout=2.0,
+        interval=0.02,
+    ):
+        self.grabber = grabber
+        self.recognizer = recognizer
+        self.board = board
+        self.mode = mode
+        self.delay = delay
+        self.timeout = timeout
+        self.interval = interval
+        self.latencies = []
+        self.timeouts = 0
+
+    def tile_pixels(self, frame, tiles):
+        rec = self.recognizer
+        th, tw = rec.tile_height, rec.tile_width
+        grid = frame[: rec.rows * th, : rec.cols * tw]
+        grid = grid.reshape(rec.rows, th, rec.cols, tw, -1)
+        return grid[[r for r, _ in tiles], :, [c for _, c in tiles]]
+
+    def expected(self, frame, clicks):
+        values = self.recognizer.read_tiles(frame, {(r, c) for r, c, _ in clicks})
+        for r, c, button in clicks:
+            if button == "left" and values[(r, c)] == 99:
+                return False
+            if button == "right" and values[(r, c)] != 0:
+                return False
+        return True
+
+    def wait(self, clicks):
+        start = time.perf_counter()
+
+        if self.mode == "fixed" or not clicks:
+            time.sleep(self.delay if self.mode == "fixed" else self.interval)
+            frame = self.grabber.grab()
+            self.latencies.append(time.perf_counter() - start)
+            return frame
+
+        # Only the clicked tiles and their neighbours are sampled: the frame
+        # has settled once two polls in a row agree there and every click shows
+        # its expected result
+        board = self.board
+        watched = set()
+        for r, c, _ in clicks:
+            i = board.index(r, c)
+            watched.add(board.coords[i])
+            watched.update(board.coords[j] for j in board.neighbors[i])
+        watched = sorted(watched)
+
+        previous = None
+        while True:
+            frame = self.grabber.grab()
+            sample = self.tile_pixels(frame, watched)
+            if (
+                previous is not None
+                and np.array_equal(sample, previous)
+                and self.expected(frame, clicks)
+            ):
+                break
+            if time.perf_counter() - start > self.timeout:
+                self.timeouts += 1
+                print(f"Frame did not settle within {self.timeout:.2f}s.")
+                break
+            previous = sample
+            time.sleep(self.interval)
+
+        self.latencies.append(time.perf_counter() - start)
+        return frame
+
+    def summary(self):
+        if not self.latencies:
+            return "Settle: no frames captured."
+        total = sum(self.latencies)
+        saved = self.delay * len(self.latencies) - total
+        return (
+            f"Settle ({self.mode}): {len(self.latencies)} frames, "
+            f"mean {total / len(self.latencies) * 1000:.0f} ms, "
+            f"p50 {percentile(self.latencies, 0.5) * 1000:.0f} ms, "
+            f"p90 {percentile(self.latencies, 0.9) * 1000:.0f} ms, "
+            f"max {max(self.latencies) * 1000:.0f} ms, "
+            f"{self.timeouts} timeouts, {saved:.1f}s saved vs fixed {self.delay}s"
+        )
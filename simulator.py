@@ -0,0 +1,276 @@
+import argparse
+import contextlib
+import os
+import random
+import time
+
+from board import Board, get_neighbors
+from dispatch import InputDispatcher, click_orders
+from frames import render_board
+from pattern_book import PatternBook
+from profiler import MoveProfiler
+from recognition import make_recognizer, recognizers
+from solver import csp_modes, play_move
+from solver_pool import SolverPool
+
+
+class MinesweeperGame:
+    def __init__(self, rows=20, cols=24, mines=99, seed=None):
+        # The first click is always safe, so one tile must stay free
+        if not 0 <= mines < rows * cols:
+            raise ValueError(f"{mines} mines don't fit on a {rows}x{cols} board")
+        self.rows = rows
+        self.cols = cols
+        self.mines = mines
+        self.rng = random.Random(seed)
+        self.mine_tiles = None
+        self.counts = [[0] * cols for _ in range(rows)]
+        self.opened = set()
+        self.flags = set()
+        self.changed = set()
+        self.state = "playing"
+
+    def place_mines(self, row, col):
+        # The first click and its neighbours are always safe, unless the
+        # board is too crowded to leave the neighbours free
+        safe = set(get_neighbors(row, col, self.counts))
+        if self.rows * self.cols - len(safe) - 1 < self.mines:
+            safe = set()
+        safe.add((row, col))
+        cells = [
+            (r, c)
+            for r in range(self.rows)
+            for c in range(self.cols)
+            if (r, c) not in safe
+        ]
+        self.mine_tiles = set(self.rng.sample(cells, self.mines))
+        for r, c in self.mine_tiles:
+            for nr, nc in get_neighbors(r, c, self.counts):
+                self.counts[nr][nc] += 1
+
+    def reveal(self, row, col):
+        if self.state != "playing" or (row, col) in self.flags:
+            return
+        if self.mine_tiles is None:
+            self.place_mines(row, col)
+        if (row, col) in self.mine_tiles:
+            self.state = "lost"
+            return
+
+        stack = [(row, col)]
+        while stack:
+            r, c = stack.pop()
+            if (r, c) in self.opened or (r, c) in self.flags:
+                continue
+            self.opened.add((r, c))
+            self.changed.add((r, c))
+            if self.counts[r][c] == 0:
+                stack.extend(get_neighbors(r, c, self.counts))
+
+        if len(self.opened) == self.rows * self.cols - self.mines:
+            self.state = "won"
+
+    def toggle_flag(self, row, col):
+        if self.state != "playing" or (row, col) in self.opened:
+            return
+        self.flags.symmetric_difference_update({(row, col)})
+        self.changed.add((row, col))
+
+    def value(self, row, col):
+        if (row, col) in self.opened:
+            return self.counts[row][col] or -1
+        if (row, col) in self.flags:
+            return 0
+        return 99
+
+    def board(self):
+        return [[self.value(r, c) for c in range(self.cols)] for r in range(self.rows)]
+
+
+class SimulatedScreen:
+    def __init__(self, game, tile_width=25, tile_height=25, render=False):
+        self.game = game
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.render = render
+        self.changed = None
+
+    # Capture backend
+    def grab(self):
+        if self.render:
+            mines = self.game.mine_tiles if self.game.state == "lost" else ()
+            return render_board(
+                self.game.board(), self.tile_width, self.tile_height, mines
+            )
+        return self.game
+
+    def close(self):
+        pass
+
+    # Recognizer
+    def reset(self):
+        self.changed = None
+
+    def read(self, frame):
+        self.changed = self.game.changed
+        self.game.changed = set()
+        return self.game.board()
+
+    # Click sink
+    def click(self, x, y, button):
+        row = y // self.tile_height
+        col = x // self.tile_width
+        if button == "left":
+            self.game.reveal(row, col)
+        else:
+            self.game.toggle_flag(row, col)
+
+    def tile_coords(self):
+        return [
+            [
+                (
+                    col * self.tile_width + self.tile_width // 2,
+                    row * self.tile_height + self.tile_height // 2,
+                )
+                for col in range(self.game.cols)
+            ]
+            for row in range(self.game.rows)
+        ]
+
+
+def play_game(
+    game,
+    screen,
+    recognizer,
+    pool,
+    order="nearest",
+    max_moves=None,
+    profiler=None,
+    csp_mode="full",
+    book=None,
+):
+    profiler = profiler or MoveProfiler(cache=pool.cache)
+    # Every tile is opened or flagged at most once, give or take a few clicks
+    # the board swallowed before they registered
+    max_moves = max_moves or 4 * game.rows * game.cols
+    board_state = Board(game.rows, game.cols)
+    dispatcher = InputDispatcher(screen.tile_coords(), screen, order=order)
+
+    center_row = game.rows // 2
+    center_col = game.cols // 2
+    row = game.rng.randint(max(0, center_row - 3), min(game.rows - 1, center_row + 3))
+    col = game.rng.randint(max(0, center_col - 3), min(game.cols - 1, center_col + 3))
+    dispatcher.left(row, col)
+    moves = len(dispatcher.flush())
+
+    move_number = 1
+    while game.state == "playing" and moves < max_moves:
+        profiler.start_move(move_number)
+        with profiler.stage("capture"):
+            frame = screen.grab()
+        with profiler.stage("recognition"):
+            board_state.update(recognizer.read(frame), recognizer.changed)
+        if not play_move(
+            board_state, dispatcher, game.mines, pool, profiler, csp_mode, book
+        ):
+            profiler.end_move()
+            break
+        with profiler.stage("dispatch"):
+            sent = dispatcher.flush()
+        profiler.note("clicks", len(sent))
+        profiler.end_move()
+        moves += len(sent)
+        move_number += 1
+
+    return game.state, moves
+
+
+parser = argparse.ArgumentParser(description="Offline Minesweeper simulator")
+parser.add_argument("--games", type=int, default=200)
+parser.add_argument("--rows", type=int, default=20)
+parser.add_argument("--cols", type=int, default=24)
+parser.add_argument("--mines", type=int, default=99)
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument(
+    "--render",
+    action="store_true",
+    help="Render every frame and read it back with --recognizer",
+)
+parser.add_argument("--recognizer", choices=sorted(recognizers), default="vectorized")
+parser.add_argument(
+    "--tile-size", type=int, default=25, help="Tile pitch when rendering"
+)
+parser.add_argument("--click-order", choices=click_orders, default="nearest")
+parser.add_argument("--csp", choices=csp_modes, default="full")
+parser.add_argument("--book", help="Pattern book file to consult before CSP and extend")
+parser.add_argument("--verbose", action="store_true", help="Show the solver output")
+parser.add_argument("--trace", help="Write a JSON line per move")
+parser.add_argument(
+    "--profile", action="store_true", help="Print per-stage timings at the end"
+)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if not 0 <= args.mines < args.rows * args.cols:
+        parser.error(f"--mines must be below the {args.rows * args.cols} tiles")
+    pool = SolverPool("threads")
+    profiler = MoveProfiler(args.trace, cache=pool.cache)
+    book = PatternBook(args.book) if args.book else None
+    results = {"won": 0, "lost": 0, "playing": 0}
+    total_moves = 0
+
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull:
+        for i in range(args.games):
+            game = MinesweeperGame(args.rows, args.cols, args.mines, seed=args.seed + i)
+            screen = SimulatedScreen(
+                game, args.tile_size, args.tile_size, render=args.render
+            )
+            if args.render:
+                recognizer = make_recognizer(
+                    args.recognizer,
+                    args.rows,
+                    args.cols,
+                    args.tile_size,
+                    args.tile_size,
+                )
+            else:
+                recognizer = screen
+            output = (
+                contextlib.nullcontext()
+                if args.verbose
+                else contextlib.redirect_stdout(devnull)
+            )
+            with output:
+                state, moves = play_game(
+                    game,
+                    screen,
+                    recognizer,
+                    pool,
+                    args.click_order,
+                    profiler=profiler,
+                    csp_mode=args.csp,
+                    book=book,
+                )
+            results[state] += 1
+            total_moves += moves
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+
+    print(
+        f"{args.games} games on {args.rows}x{args.cols} with {args.mines} mines: "
+        f"{results['won']} won, {results['lost']} lost, {results['playing']} unfinished "
+        f"({results['won'] / args.games * 100:.1f}% win rate)"
+    )
+    print(
+        f"{elapsed:.1f}s, {args.games / elapsed * 60:.0f} games/min, "
+        f"{total_moves / elapsed:.0f} moves/s"
+    )
+    print(pool.cache.summary())
+    if book:
+        book.save()
+        print(book.summary())
+    if args.profile:
+        print(profiler.summary())
+    profiler.close()
@@ -0,0 +1,389 @@
+import collections
+import random
+
+from csp import proven_safe
+from patterns import deduce
+from probability import mine_probabilities
+from profiler import null_profiler
+from solver_pool import SolverPool
+
+solver_pool = SolverPool("threads")
+
+csp_modes = ("full", "first-safe")
+
+
+def process_board(board_state, dispatcher):
+    values = board_state.values
+    neighbors = board_state.neighbors
+    coords = board_state.coords
+    flags = []
+    to_click = []
+
+    dirty = board_state.take_dirty("process")
+    for i in dirty:
+        unopened_neighbors = [j for j in neighbors[i] if values[j] in (99, 0)]
+        if values[i] == len(unopened_neighbors):
+            flags.extend(unopened_neighbors)
+
+    flags = list(set(flags))
+    made_flag = False
+    for j in flags:
+        if dispatcher.right(*coords[j], board_state):
+            board_state.mark(j, 0)
+            made_flag = True
+
+    # Flagging re-queues the numbers around each new flag
+    for i in sorted(set(dirty) | set(board_state.take_dirty("process"))):
+        flag_count = sum(1 for j in neighbors[i] if values[j] == 0)
+        if values[i] == flag_count:
+            to_click.extend(j for j in neighbors[i] if values[j] == 99)
+
+    to_click = list(set(to_click))
+    made_click = False
+    for j in to_click:
+        if dispatcher.left(*coords[j], board_state):
+            board_state.mark(j, -2)
+            made_click = True
+
+    return made_flag or made_click
+
+
+def guess_least_risky_tile(board, mines=None, pool=None, profiler=null_profiler):
+    variables, constraints = collect_constraints(board)
+    components = find_connected_components(variables, constraints)
+    solutions = solve_components(components, pool, profiler)
+
+    interior = {board.coords[i] for i in board.unopened}.difference(variables)
+    mines_left = None if mines is None else mines - len(board.flagged)
+    probabilities = mine_probabilities(solutions, interior, mines_left)
+    if probabilities is None:
+        print("Mine count is inconsistent with the board; ignoring it.")
+        probabilities = mine_probabilities(solutions, interior)
+
+    if probabilities:
+        best_tile, probability = min(sorted(probabilities.items()), key=lambda x: x[1])
+        print(f"Lowest mine probability: {probability:.3f}")
+        return best_tile
+
+    all_unopened = sorted(board.unopened)
+    if all_unopened:
+        return board.coords[random.choice(all_unopened)]
+
+    return None
+
+
+def find_connected_components(variables, constraints):
+    if not variables:
+        return []
+
+    adj = collections.defaultdict(list)
+    for var_tuple, _ in constraints:
+        for i in range(len(var_tuple)):
+            for j in range(i + 1, len(var_tuple)):
+                u, v = var_tuple[i], var_tuple[j]
+                adj[u].append(v)
+                adj[v].append(u)
+
+    components = []
+    visited = set()
+    for var in variables:
+        if var not in visited:
+            component_vars = set()
+            q = collections.deque([var])
+            visited.add(var)
+            while q:
+                current_var = q.popleft()
+                component_vars.add(current_var)
+                if current_var in adj:
+                    for neighbor in adj[current_var]:
+                        if neighbor not in visited:
+                            visited.add(neighbor)
+                            q.append(neighbor)
+
+            component_constraints = []
+            for constraint_vars, required_mines in constraints:
+                if any(v in component_vars for v in constraint_vars):
+                    component_constraints.append((constraint_vars, required_mines))
+
+            final_component_vars = sorted(list(component_vars))
+            components.append((final_component_vars, component_constraints))
+
+    print(f"Split problem into {len(components)} independent component(s).")
+    return components
+
+
+def collect_constraints(board):
+    values = board.values
+    coords = board.coords
+    unopened_neighbors_of_numbers = set()
+    constraints = []
+
+    for i in sorted(board.frontier):
+        unopened_in_constraint = []
+        flagged_count = 0
+
+        for j in board.neighbors[i]:
+            if values[j] == 99:
+                unopened_in_constraint.append(coords[j])
+                unopened_neighbors_of_numbers.add(coords[j])
+            elif values[j] == 0:
+                flagged_count += 1
+
+        if unopened_in_constraint:
+            constraint_vars = tuple(sorted(unopened_in_constraint))
+            required_mines = values[i] - flagged_count
+            constraints.append((constraint_vars, required_mines))
+
+    variables = sorted(list(unopened_neighbors_of_numbers))
+    return variables, list(set(constraints))
+
+
+def solve_components(components, pool=None, profiler=null_profiler):
+    pool = pool or solver_pool
+    futures = []
+    for comp_vars, comp_consts in components:
+        print(
+            f"Running CSP solver on a component with {len(comp_vars)} variables and {len(comp_consts)} constraints..."
+        )
+        futures.append(pool.submit(comp_vars, comp_consts))
+
+    solutions = []
+    for (comp_vars, _), future in zip(components, futures):
+        try:
+            solution = future.result()
+            print(f"CSP solver found {solution.total} solution(s) for a component.")
+            profiler.add_component(comp_vars, solution)
+            solutions.append(solution)
+        except Exception as exc:
+            print(f"A component generated an exception: {exc}")
+    return solutions
+
+
+def solve_constraints_concurrently(
+    variables, constraints, touched=None, pool=None, profiler=null_profiler
+):
+    components = find_connected_components(variables, constraints)
+    if touched is not None:
+        # Untouched components were already solved without result
+        components = [
+            (comp_vars, comp_consts)
+            for comp_vars, comp_consts in components
+            if not touched.isdisjoint(comp_vars)
+        ]
+
+    all_safe_tiles = []
+    all_mine_tiles = []
+    for solution in solve_components(components, pool, profiler):
+        all_safe_tiles.extend(solution.safe)
+        all_mine_tiles.extend(solution.mines)
+    return all_safe_tiles, all_mine_tiles
+
+
+def first_safe_tile(
+    variables, constraints, touched=None, pool=None, profiler=null_profiler
+):
+    # One safe tile is enough to keep going, so components are searched
+    # smallest first and the first tile proven safe is returned at once. The
+    # components after it go to the pool's executor, whose cache has their
+    # full results ready by the time a later move needs them
+    pool = pool or solver_pool
+    components = find_connected_components(variables, constraints)
+    if touched is not None:
+        components = [
+            (comp_vars, comp_consts)
+            for comp_vars, comp_consts in components
+            if not touched.isdisjoint(comp_vars)
+        ]
+    components.sort(key=lambda component: len(component[0]))
+
+    # Components searched rather than counted have no solution total, so the
+    # trace gets their sizes
+    searched = []
+
+    for k, (comp_vars, comp_consts) in enumerate(components):
+        # Components already counted, or small enough that counting is cheaper
+        # than searching, go through the pool and its cache
+        if len(comp_vars) < pool.inline_threshold or pool.cache.contains(
+            comp_vars, comp_consts
+        ):
+            solution = pool.submit(comp_vars, comp_consts).result()
+            profiler.add_component(comp_vars, solution)
+            tile = next(iter(solution.safe), None)
+        else:
+            searched.append(len(comp_vars))
+            tile = next(proven_safe(comp_vars, comp_consts), None)
+        if tile is not None:
+            for rest_vars, rest_consts in components[k + 1 :]:
+                pool.submit(rest_vars, rest_consts, background=True)
+            profiler.note("searched_variables", searched)
+            profiler.note("background_components", len(components) - k - 1)
+            return tile
+    profiler.note("searched_variables", searched)
+    return None
+
+
+def get_effective_tile_info(i, board):
+    values = board.values
+    if not (1 <= values[i] <= 8):
+        return None, None
+
+    flagged_count = 0
+    unopened_neighbors = []
+
+    for j in board.neighbors[i]:
+        if values[j] == 0:  # Flagged
+            flagged_count += 1
+        elif values[j] == 99:  # Unopened
+            unopened_neighbors.append(j)
+
+    effective_value = values[i] - flagged_count
+    return effective_value, set(unopened_neighbors)
+
+
+def recognize_and_apply_patterns(board, dispatcher):
+    made_move = False
+
+    # Nothing new can follow unless a constraint changed since the last pass
+    values = board.values
+    coords = board.coords
+    if not board.take_dirty("patterns"):
+        return False
+
+    constraints = []
+    for i in sorted(board.frontier):
+        rem_mines, unopened = get_effective_tile_info(i, board)
+        if unopened:
+            constraints.append((unopened, rem_mines))
+
+    safe_tiles, mine_tiles = deduce(constraints)
+    safes_to_click = {tile for tile in safe_tiles if values[tile] == 99}
+    mines_to_flag = {tile for tile in mine_tiles if values[tile] == 99}
+
+    if safes_to_click:
+        safe_coords = {coords[tile] for tile in safes_to_click}
+        print(f"Pattern Recognition found safe tiles: {safe_coords}")
+        for tile in safes_to_click:
+            if dispatcher.left(*coords[tile], board):
+                board.mark(tile, -2)  # Mark as clicked
+                made_move = True
+
+    if mines_to_flag:
+        mine_coords = {coords[tile] for tile in mines_to_flag}
+        print(f"Pattern Recognition found mines: {mine_coords}")
+        for tile in mines_to_flag:
+            if dispatcher.right(*coords[tile], board):
+                board.mark(tile, 0)  # Mark as flagged
+                made_move = True
+
+    return made_move
+
+
+def apply_pattern_book(board, dispatcher, book):
+    made_move = False
+    for i in board.take_dirty("book"):
+        if i not in board.frontier:
+            continue
+        safe_tiles, mine_tiles = book.lookup(board, i)
+        for tile in safe_tiles:
+            if dispatcher.left(*board.coords[tile], board):
+                board.mark(tile, -2)
+                made_move = True
+        for tile in mine_tiles:
+            if dispatcher.right(*board.coords[tile], board):
+                board.mark(tile, 0)
+                made_move = True
+    if made_move:
+        print("Pattern book found a known position.")
+    return made_move
+
+
+def play_move(
+    board_state,
+    dispatcher,
+    mines=None,
+    pool=None,
+    profiler=null_profiler,
+    csp_mode="full",
+    book=None,
+):
+    with profiler.stage("process"):
+        move_made = process_board(board_state, dispatcher)
+    resolved_by = "process"
+
+    if not move_made:
+        with profiler.stage("patterns"):
+            move_made = recognize_and_apply_patterns(board_state, dispatcher)
+        resolved_by = "patterns"
+
+    if not move_made and book is not None:
+        with profiler.stage("book"):
+            move_made = apply_pattern_book(board_state, dispatcher, book)
+        resolved_by = "book"
+
+    if not move_made:
+        print(
+            "No deterministic or pattern-based moves found. Trying Constraint Satisfaction solver..."
+        )
+        with profiler.stage("csp"):
+            dirty = board_state.take_dirty("csp")
+            touched = {board_state.coords[j] for j in board_state.unopened_near(dirty)}
+            variables, constraints = collect_constraints(board_state)
+
+            if variables and csp_mode == "first-safe":
+                safe_tile = first_safe_tile(
+                    variables, constraints, touched, pool, profiler
+                )
+                if safe_tile and dispatcher.left(*safe_tile, board_state):
+                    print(f"First-safe search found a safe tile: {safe_tile}")
+                    board_state.mark(board_state.index(*safe_tile), -2)
+                    move_made = True
+                    # The other components were not fully solved this move
+                    board_state.pending["csp"].update(
+                        i for i in dirty if i in board_state.frontier
+                    )
+
+            if not variables:
+                print("No constraints found for solver.")
+            elif not move_made:
+                safe_tiles, mine_tiles = solve_constraints_concurrently(
+                    variables, constraints, touched, pool, profiler
+                )
+                if book is not None and (safe_tiles or mine_tiles):
+                    book.learn(board_state, safe_tiles + mine_tiles)
+
+                if safe_tiles:
+                    print(f"CSP found guaranteed safe tiles: {safe_tiles}")
+                    for r, c in safe_tiles:
+                        if dispatcher.left(r, c, board_state):
+                            board_state.mark(board_state.index(r, c), -2)
+                            move_made = True
+
+                if mine_tiles:
+                    print(f"CSP found guaranteed mines: {mine_tiles}")
+                    for r, c in mine_tiles:
+                        if dispatcher.right(r, c, board_state):
+                            board_state.mark(board_state.index(r, c), 0)
+                            move_made = True
+        resolved_by = "csp"
+
+    if not move_made:
+        print(
+            "No guaranteed moves found by any solver. Attempting least risky guess..."
+        )
+        with profiler.stage("guess"):
+            guess_tile = guess_least_risky_tile(board_state, mines, pool, profiler)
+        resolved_by = "guess"
+        if guess_tile:
+            r, c = guess_tile
+            print(f"Guessing tile at ({r}, {c})")
+            dispatcher.left(r, c, board_state)
+        else:
+            if not board_state.unopened:
+                print("Game appears to be won! Stopping.")
+            else:
+                print("Could not determine a guess. Stopping.")
+            profiler.note("resolved_by", None)
+            return False
+
+    profiler.note("resolved_by", resolved_by)
+    return True
@@ -0,0 +1,104 @@
+import array
+import concurrent.futures
+import os
+
+from csp import ComponentCache, ComponentSolution, count_solutions, encode
+
+executor_modes = ("threads", "processes")
+
+
+def pack_component(variables, constraints):
+    # Coordinates go over the pipe as one bytes blob and constraints as
+    # (bitmask, mines) pairs, which pickle far smaller than tuples of tuples
+    coords = array.array("H", [x for var in variables for x in var])
+    return coords.tobytes(), tuple(encode(variables, constraints))
+
+
+def unpack_component(packed):
+    coords, encoded = packed
+    flat = array.array("H")
+    flat.frombytes(coords)
+    variables = list(zip(flat[::2], flat[1::2]))
+    constraints = [
+        (tuple(var for i, var in enumerate(variables) if mask >> i & 1), mines)
+        for mask, mines in encoded
+    ]
+    return variables, constraints
+
+
+def solve_packed(packed):
+    variables, constraints = unpack_component(packed)
+    solution = count_solutions(variables, constraints)
+    index = {var: i for i, var in enumerate(variables)}
+    order = [index[var] for var in solution.variables]
+    mine_counts = [solution.mine_counts[var] for var in solution.variables]
+    return order, solution.counts, mine_counts
+
+
+def unpack_solution(variables, result):
+    order, counts, mine_counts = result
+    ordered = [variables[i] for i in order]
+    return ComponentSolution(ordered, counts, dict(zip(ordered, mine_counts)))
+
+
+def warm_up():
+    count_solutions([(0, 0), (0, 1)], [(((0, 0), (0, 1)), 1)])
+    return os.getpid()
+
+
+class SolverPool:
+    def __init__(
+        self, mode="threads", workers=None, inline_threshold=16, cache_size=4096
+    ):
+        self.mode = mode
+        self.inline_threshold = inline_threshold
+        self.cache = ComponentCache(cache_size)
+        if mode == "processes":
+            workers = workers or os.cpu_count() or 1
+            self.executor = concurrent.futures.ProcessPoolExecutor(workers)
+            pids = {
+                future.result()
+                for future in [self.executor.submit(warm_up) for _ in range(workers)]
+            }
+            print(f"Started {len(pids)} CSP worker process(es).")
+        else:
+            self.executor = concurrent.futures.ThreadPoolExecutor(workers)
+
+    def submit(self, variables, constraints, background=False):
+        # Background components always go to the executor, so nobody waits
+        # for them however small they are
+        cached = self.cache.get(variables, constraints)
+        if cached is not None:
+            future = concurrent.futures.Future()
+            future.set_result(cached)
+            return future
+
+        if len(variables) < self.inline_threshold and not background:
+            future = concurrent.futures.Future()
+            try:
+                future.set_result(count_solutions(variables, constraints))
+            except Exception as exc:
+                future.set_exception(exc)
+        elif self.mode != "processes":
+            future = self.executor.submit(count_solutions, variables, constraints)
+        else:
+            future = concurrent.futures.Future()
+            packed = pack_component(variables, constraints)
+
+            def done(inner):
+                try:
+                    future.set_result(unpack_solution(variables, inner.result()))
+                except Exception as exc:
+                    future.set_exception(exc)
+
+            self.executor.submit(solve_packed, packed).add_done_callback(done)
+
+        def remember(solved):
+            if solved.exception() is None:
+                self.cache.put(variables, constraints, solved.result())
+
+        future.add_done_callback(remember)
+        return future
+
+    def shutdown(self):
+        self.executor.shutdown()
@@ -0,0 +1,181 @@
+import argparse
+import concurrent.futures
+import contextlib
+import multiprocessing
+import os
+import time
+
+from dispatch import click_orders
+
+input_lock = None
+
+
+def init_worker(lock):
+    global input_lock
+    input_lock = lock
+
+
+def session_output(log_dir, name):
+    if log_dir:
+        return open(os.path.join(log_dir, f"{name}.log"), "w")
+    return open(os.devnull, "w")
+
+
+def run_simulated(index, games, rows, cols, mines, seed, click_order, log_dir=None):
+    from simulator import MinesweeperGame, SimulatedScreen, play_game
+    from solver_pool import SolverPool
+
+    name = f"sim-{index}"
+    start = time.perf_counter()
+    cpu = time.process_time()
+    won = 0
+    moves = 0
+
+    pool = SolverPool("threads")
+    with session_output(log_dir, name) as output, contextlib.redirect_stdout(output):
+        for i in range(games):
+            game = MinesweeperGame(rows, cols, mines, seed=seed + i)
+            screen = SimulatedScreen(game)
+            state, game_moves = play_game(game, screen, screen, pool, click_order)
+            won += state == "won"
+            moves += game_moves
+    pool.shutdown()
+
+    return {
+        "name": name,
+        "games": games,
+        "won": won,
+        "moves": moves,
+        "elapsed": time.perf_counter() - start,
+        "cpu": time.process_time() - cpu,
+    }
+
+
+def run_screen(index, calibration_path, bot_args, log_dir=None):
+    from calibration import load_calibration
+    from main import parser
+    from session import BotSession
+
+    name = f"session{index}"
+    args = parser.parse_args(bot_args)
+    if args.record:
+        args.record = os.path.join(args.record, name)
+    if args.trace:
+        args.trace = f"{name}-{args.trace}"
+    geometry = load_calibration(calibration_path)
+    if geometry is None:
+        raise ValueError(f"Calibration profile {calibration_path} not found")
+
+    with session_output(log_dir, name) as output, contextlib.redirect_stdout(output):
+        session = BotSession(args, geometry, name=name, input_lock=input_lock)
+        try:
+            result = session.run()
+        finally:
+            session.close()
+
+    return result
+
+
+def report(results, elapsed):
+    lines = [
+        f"{'session':<12}{'games':>7}{'won':>6}{'moves':>8}{'wall s':>9}"
+        f"{'cpu s':>8}{'cpu %':>7}{'games/h':>9}"
+    ]
+    for result in sorted(results, key=lambda r: r["name"]):
+        lines.append(
+            f"{result['name']:<12}{result['games']:>7}{result['won']:>6}"
+            f"{result['moves']:>8}{result['elapsed']:>9.1f}{result['cpu']:>8.1f}"
+            f"{result['cpu'] / max(result['elapsed'], 1e-9) * 100:>7.0f}"
+            f"{result['games'] / max(result['elapsed'], 1e-9) * 3600:>9.0f}"
+        )
+
+    games = sum(result["games"] for result in results)
+    won = sum(result["won"] for result in results)
+    cpu = sum(result["cpu"] for result in results)
+    lines.append(
+        f"{len(results)} session(s): {games} games, {won} won, "
+        f"{games / elapsed * 3600:.0f} games/hour overall, "
+        f"{cpu:.1f}s CPU in {elapsed:.1f}s wall ({os.cpu_count()} cores)"
+    )
+    return "\n".join(lines)
+
+
+parser = argparse.ArgumentParser(
+    description="Run several Minesweeper bot sessions in parallel processes"
+)
+parser.add_argument(
+    "--sessions",
+    type=int,
+    default=os.cpu_count(),
+    help="Number of simulated sessions",
+)
+parser.add_argument(
+    "--calibrations",
+    nargs="+",
+    help="Play on screen instead, one session per calibration profile (board region)",
+)
+parser.add_argument("--games", type=int, default=50, help="Games per simulated session")
+parser.add_argument("--rows", type=int, default=20)
+parser.add_argument("--cols", type=int, default=24)
+parser.add_argument("--mines", type=int, default=99)
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--click-order", choices=click_orders, default="nearest")
+parser.add_argument("--log-dir", help="Write each session's output to NAME.log here")
+parser.add_argument(
+    "bot_args",
+    nargs=argparse.REMAINDER,
+    help="Options passed to every on-screen session (after --)",
+)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    bot_args = [arg for arg in args.bot_args if arg != "--"]
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+
+    if args.calibrations:
+        sessions = len(args.calibrations)
+        jobs = [
+            (run_screen, index, path, bot_args, args.log_dir)
+            for index, path in enumerate(args.calibrations)
+        ]
+    else:
+        sessions = args.sessions
+        jobs = [
+            (
+                run_simulated,
+                index,
+                args.games,
+                args.rows,
+                args.cols,
+                args.mines,
+                args.seed + index * args.games,
+                args.click_order,
+                args.log_dir,
+            )
+            for index in range(sessions)
+        ]
+
+    print(f"Starting {sessions} session(s)...")
+    start = time.perf_counter()
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(
+        sessions, initializer=init_worker, initargs=(multiprocessing.Lock(),)
+    ) as executor:
+        futures = [executor.submit(*job) for job in jobs]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as exc:
+                print(f"A session failed: {exc}")
+                continue
+            results.append(result)
+            print(
+                f"{result['name']} finished: {result['won']}/{result['games']} won "
+                f"in {result['elapsed']:.1f}s"
+            )
+    elapsed = time.perf_counter() - start
+
+    if results:
+        print(report(results, elapsed))